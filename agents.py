@@ -3,14 +3,136 @@ Specialized Agents for Multi-Agent System
 - Project Planning Agent
 - Code Generation Agent
 - Code Evaluation Agent
+- Multi-Stage Agent (planning and coding in one conversation)
 """
 
+import re
 import json
-from typing import List, Dict, Any, Optional
-from llm_client import LLMClient
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+from llm_client import LLMClient, count_tokens, count_message_tokens
 from tools import ToolManager
+from llm_cache import SemanticCache
 import logging
 
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard library parser
+    orjson = None
+
+try:
+    # google-re2 matches in linear time with no backtracking on long responses
+    import re2 as _regex
+except ImportError:
+    _regex = re
+
+
+# Matches a fenced ```json block, falling back to the outermost {...} span.
+# DOTALL is set inline so the same pattern compiles under re and re2.
+_JSON_BLOCK_RE = _regex.compile(r"(?s)```(?:json)?\s*(\{.*?\})\s*```|(\{.*\})")
+
+_JSON_DECODER = json.JSONDecoder()
+
+# Plan emitted by MultiStageAgent ahead of its tool calls
+_PLAN_BLOCK_RE = _regex.compile(r"(?s)<PLAN>(.*?)</PLAN>")
+
+# Start of the task list in a plan JSON object
+_TASKS_ARRAY_RE = _regex.compile(r'"tasks"\s*:\s*\[')
+
+# Provider JSON mode: the reply is a bare JSON object, no fences or prose.
+# LLMClient only sends it to providers configured with json_mode
+_JSON_RESPONSE_FORMAT = {"type": "json_object"}
+
+
+def _extract_json(content: str) -> Dict[str, Any]:
+    """Extract and parse the JSON object embedded in an LLM response"""
+    match = _JSON_BLOCK_RE.search(content)
+    json_str = (match.group(1) or match.group(2)) if match else content.strip()
+
+    if orjson is not None:
+        try:
+            return orjson.loads(json_str)
+        except orjson.JSONDecodeError:
+            pass
+
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        # Prose with braces after the object defeats the greedy span; decode just the first object
+        start = content.find("{")
+        if start == -1:
+            raise
+        return _JSON_DECODER.raw_decode(content, start)[0]
+
+
+def _dumps(obj: Any, indent: bool = False) -> str:
+    """Serialize an object to a JSON string, using orjson when available"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None)
+
+
+def _loads(text: str) -> Any:
+    """Parse a JSON document strictly, using orjson when available"""
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+class _PlanTaskStream:
+    """Extracts complete task objects from a plan JSON object as it streams in"""
+
+    def __init__(self):
+        self._text = ""
+        self._pos: Optional[int] = None
+        self._closed = False
+        # Plan fields that precede the task list (project_overview, architecture, ...)
+        self.header: Dict[str, Any] = {}
+        self.tasks: List[Dict[str, Any]] = []
+
+    def feed(self, fragment: str) -> List[Dict[str, Any]]:
+        """Add streamed text and return the tasks it completed"""
+        self._text += fragment
+        if self._closed:
+            return []
+
+        if self._pos is None:
+            match = _TASKS_ARRAY_RE.search(self._text)
+            if match is None:
+                return []
+            self._pos = match.end()
+            # The object may follow a code fence or a line of prose
+            start = max(self._text.find("{", 0, match.start()), 0)
+            try:
+                header = json.loads(self._text[start:match.start()].rstrip().rstrip(",") + "}")
+                self.header = header if isinstance(header, dict) else {}
+            except json.JSONDecodeError:
+                pass
+
+        ready = []
+        text = self._text
+        while True:
+            pos = self._pos
+            while pos < len(text) and text[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(text):
+                break
+            if text[pos] == "]":
+                self._closed = True
+                break
+            try:
+                # An object still streaming fails to decode until its closing brace arrives
+                task, self._pos = _JSON_DECODER.raw_decode(text, pos)
+            except json.JSONDecodeError:
+                break
+            if isinstance(task, dict):
+                self.tasks.append(task)
+                ready.append(task)
+
+        return ready
+
 
 class BaseAgent:
     """Base class for all agents"""
@@ -21,13 +143,15 @@ class BaseAgent:
             llm_client: LLMClient,
             tool_manager: ToolManager,
             temperature: float = 0.7,
-            max_tokens: int = 4000
+            max_tokens: int = 4000,
+            cache: Optional[SemanticCache] = None
     ):
         self.name = name
         self.llm_client = llm_client
         self.tool_manager = tool_manager
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.cache = cache
         self.conversation_history: List[Dict[str, str]] = []
         self.logger = logging.getLogger(self.name)
 
@@ -35,6 +159,16 @@ class BaseAgent:
         """Return the system prompt for this agent"""
         raise NotImplementedError
 
+    @property
+    def prompt_cache_key(self) -> str:
+        """Stable provider cache key for this agent class's system prompt"""
+        cls = type(self)
+        key = cls.__dict__.get("_prompt_cache_key")
+        if key is None:
+            key = hashlib.md5(self.get_system_prompt().encode("utf-8")).hexdigest()
+            cls._prompt_cache_key = key
+        return key
+
     def reset_conversation(self):
         """Reset conversation history"""
         self.conversation_history = []
@@ -46,16 +180,41 @@ class BaseAgent:
             "content": content
         })
 
-    def execute(self, task: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Execute a task"""
+    async def _acomplete(self, messages: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        """Call the LLM, serving exact repeats of deterministic tool-free prompts from the response cache"""
+        scope = None
+        if self.cache is not None and kwargs.get("temperature") == 0 and not kwargs.get("tools"):
+            # Model and request parameters are part of the key; messages are matched verbatim
+            scope = f"{self.name}|{self.llm_client.model}|{_dumps(kwargs)}"
+            cached = self.cache.lookup(scope, messages)
+            if cached is not None:
+                self.logger.info("Using cached LLM response")
+                return cached
+
+        response = await self.llm_client.aretry_chat_completion(
+            messages=messages,
+            prompt_cache_key=self.prompt_cache_key,
+            **kwargs
+        )
+
+        if scope is not None and response["success"]:
+            self.cache.store(scope, messages, response)
+
+        return response
+
+    async def aexecute(self, task: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Execute a task asynchronously"""
         raise NotImplementedError
 
+    def execute(self, *args, **kwargs) -> Dict[str, Any]:
+        """Execute a task, blocking until aexecute completes"""
+        return asyncio.run(self.aexecute(*args, **kwargs))
+
 
 class ProjectPlanningAgent(BaseAgent):
     """Agent responsible for project planning and task decomposition"""
 
-    def get_system_prompt(self) -> str:
-        return """You are a Senior Software Architect and Project Planning Agent specializing in frontend development.
+    SYSTEM_PROMPT = """You are a Senior Software Architect and Project Planning Agent specializing in frontend development.
 
 Your responsibilities:
 1. Analyze project requirements and break them down into concrete, executable tasks
@@ -152,60 +311,55 @@ Output your plan as a JSON object with this structure:
 
 Be specific, actionable, and focus on simplicity. **ALWAYS plan for API failure scenarios.**"""
 
-    def execute(self, task: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # Shared, never mutated: reused as messages[0] on every call
+    _SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
+
+    def get_system_prompt(self) -> str:
+        return self.SYSTEM_PROMPT
+
+    async def aexecute(self, task: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Execute planning task"""
-        self.logger.info(f"Starting project planning for task: {task[:100]}...")
+        self.logger.info("Starting project planning for task: %s...", task[:100])
 
         # Build messages
         messages = [
-            {"role": "system", "content": self.get_system_prompt()},
+            self._SYSTEM_MSG,
             {"role": "user", "content": f"Plan the following project:\n\n{task}"}
         ]
 
         if context:
             messages.append({
                 "role": "user",
-                "content": f"Additional context:\n{json.dumps(context, indent=2)}"
+                "content": f"Additional context:\n{_dumps(context, indent=True)}"
             })
 
         # Call LLM
-        response = self.llm_client.retry_chat_completion(
+        response = await self._acomplete(
             messages=messages,
             temperature=self.temperature,
-            max_tokens=self.max_tokens
+            max_tokens=self.max_tokens,
+            response_format=_JSON_RESPONSE_FORMAT
         )
 
         if not response["success"]:
-            self.logger.error(f"Planning failed: {response.get('error')}")
+            self.logger.error("Planning failed: %s", response.get('error'))
             return {
                 "success": False,
                 "error": response.get("error"),
                 "plan": None
             }
 
-        # Parse the plan
+        return self._parse_plan(response)
+
+    def _parse_plan(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """Parse a successful planning response into a result dictionary"""
         try:
             content = response["content"]
-            self.logger.info(f"Received planning response: {len(content)} characters")
-
-            # Extract JSON from response
-            if "```json" in content:
-                json_start = content.find("```json") + 7
-                json_end = content.find("```", json_start)
-                json_str = content[json_start:json_end].strip()
-            elif "```" in content:
-                json_start = content.find("```") + 3
-                json_end = content.find("```", json_start)
-                json_str = content[json_start:json_end].strip()
-            else:
-                # Try to find JSON object
-                json_start = content.find("{")
-                json_end = content.rfind("}") + 1
-                json_str = content[json_start:json_end].strip()
+            self.logger.info("Received planning response: %s characters", len(content))
 
-            plan = json.loads(json_str)
+            plan = _extract_json(content)
 
-            self.logger.info(f"Successfully parsed plan with {len(plan.get('tasks', []))} tasks")
+            self.logger.info("Successfully parsed plan with %s tasks", len(plan.get('tasks', [])))
 
             return {
                 "success": True,
@@ -214,7 +368,7 @@ Be specific, actionable, and focus on simplicity. **ALWAYS plan for API failure
             }
 
         except json.JSONDecodeError as e:
-            self.logger.error(f"Failed to parse plan JSON: {str(e)}")
+            self.logger.error("Failed to parse plan JSON: %s", e)
             # Return raw content as fallback
             return {
                 "success": False,
@@ -223,12 +377,149 @@ Be specific, actionable, and focus on simplicity. **ALWAYS plan for API failure
                 "raw_response": response["content"]
             }
 
+    async def astream_execute(self, task: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Plan a project from a streamed response, yielding tasks as they complete
+
+        Yields:
+            ("header", fields) once, with the plan fields that precede the
+            task list; ("task", task) for each planned task, in plan order, as
+            soon as its JSON object has streamed in; then ("done", result)
+            with the same shape aexecute returns. If the stream fails before
+            any task arrived, falls back to a regular (retried) planning request.
+        """
+        self.logger.info("Starting streamed project planning for task: %s...", task[:100])
+
+        messages = [
+            self._SYSTEM_MSG,
+            {"role": "user", "content": f"Plan the following project:\n\n{task}"}
+        ]
+
+        stream = _PlanTaskStream()
+        response = None
+        header_sent = False
+        async for event, payload in self.llm_client.astream_chat_completion(
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                prompt_cache_key=self.prompt_cache_key,
+                response_format=_JSON_RESPONSE_FORMAT
+        ):
+            if event == "content":
+                for planned in stream.feed(payload):
+                    if not header_sent:
+                        header_sent = True
+                        yield "header", stream.header
+                    yield "task", planned
+            elif event == "done":
+                response = payload
+
+        if not response["success"] and not stream.tasks:
+            self.logger.warning("Streamed planning failed, retrying without streaming: %s", response.get('error'))
+            result = await self.aexecute(task)
+        elif not response["success"]:
+            self.logger.error("Planning failed: %s", response.get('error'))
+            result = {"success": False, "error": response.get("error"), "plan": None}
+        else:
+            result = self._parse_plan(response)
+
+        # Tasks the incremental parser did not pick up are released with the full plan
+        if result["success"]:
+            if not header_sent:
+                yield "header", {k: v for k, v in result["plan"].items() if k != "tasks"}
+            streamed = {planned.get("task_id") for planned in stream.tasks}
+            for planned in result["plan"].get("tasks", []):
+                if planned.get("task_id") not in streamed:
+                    yield "task", planned
+
+        yield "done", result
+
 
 class CodeGenerationAgent(BaseAgent):
     """Agent responsible for generating code based on tasks"""
 
-    def get_system_prompt(self) -> str:
-        return """You are an Expert Frontend Developer specialized in creating clean, functional web applications.
+    # Size (tokens) of the summarizable middle of the prompt above which it is summarized
+    HISTORY_TOKEN_LIMIT = 6000
+    # Recent turns whose tool payloads are kept verbatim
+    FULL_PAYLOAD_TURNS = 2
+    # Longer string fields in older tool arguments/results are elided
+    MAX_PAYLOAD_CHARS = 500
+
+    # Appended to the task when the agent reviews its own code, replacing a separate evaluation call
+    SELF_REVIEW_PROMPT = """
+
+When every file is created, finish with a final reply (no tool calls) that contains only a JSON review of the code you wrote:
+{"overall_quality": "excellent|good|fair|poor", "functionality_score": 0-10, "code_quality_score": 0-10, "robustness_score": 0-10, "issues": [{"severity": "critical|major|minor", "type": "bug|security|quality|style", "description": "...", "file": "...", "suggestion": "..."}], "strengths": [...], "recommendations": [...], "passes_requirements": true/false}"""
+
+    def __init__(self, *args, max_tool_workers: int = 8, stream: bool = True, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Tool calls emitted in one assistant turn are independent and I/O-bound
+        self.tool_executor = ThreadPoolExecutor(max_workers=max_tool_workers)
+        self.stream = stream
+
+    def _start_tool(self, tool_call: Dict[str, Any]) -> "asyncio.Future":
+        """Run a tool call on the tool executor"""
+        tool_name = tool_call["function"]["name"]
+        self.logger.info("Executing tool: %s", tool_name)
+        loop = asyncio.get_running_loop()
+        if tool_name == "web_search":
+            # Served as pre-serialized JSON, so the result needs no encoding
+            return loop.run_in_executor(
+                self.tool_executor,
+                self.tool_manager.web_search.execute_json,
+                tool_call["function"]["arguments"]
+            )
+        return loop.run_in_executor(
+            self.tool_executor,
+            self.tool_manager.execute_tool,
+            tool_name,
+            tool_call["function"]["arguments"]
+        )
+
+    async def _aturn(self, messages: List[Dict[str, Any]], tools: List[Dict[str, Any]], start_tools: bool = True):
+        """
+        Run one LLM turn and start its tool calls
+
+        When streaming, each tool call starts executing as soon as its
+        arguments have finished streaming, overlapping tool I/O with the rest
+        of the generation. Falls back to a regular (retried) completion if
+        the stream fails before any tool was started. With start_tools False,
+        no tool call is started and the futures list is empty.
+
+        Returns:
+            (response, tool futures in tool_calls order)
+        """
+        if self.stream:
+            futures = []
+            response = None
+            async for event, payload in self.llm_client.astream_chat_completion(
+                    messages=messages,
+                    tools=tools,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    prompt_cache_key=self.prompt_cache_key
+            ):
+                if event == "tool_call" and start_tools:
+                    futures.append(self._start_tool(payload))
+                elif event == "done":
+                    response = payload
+
+            if response["success"] or futures:
+                return response, futures
+
+            self.logger.warning("Streaming failed, retrying without streaming: %s", response.get('error'))
+
+        response = await self._acomplete(
+            messages=messages,
+            tools=tools,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens
+        )
+        start = start_tools and response["success"]
+        futures = [self._start_tool(tc) for tc in response["tool_calls"]] if start else []
+        return response, futures
+
+    SYSTEM_PROMPT = """You are an Expert Frontend Developer specialized in creating clean, functional web applications.
 
 Your expertise:
 - Native HTML5, CSS3, and vanilla JavaScript
@@ -320,8 +611,10 @@ When generating code:
 
 You have access to these tools:
 - create_file: Create a new file with content
+- create_file_parts: Create a new file from several content parts (header, body, footer)
 - read_file: Read existing file content
 - create_directory: Create directories
+- copy_file: Copy an existing file to a new path
 - web_search: Search for documentation or resources
 
 **For arXiv Projects Specifically:**
@@ -333,12 +626,120 @@ When creating API integration:
 4. Add API call as enhancement (that gracefully fails)
 5. Show badge/indicator: "📊 Demo Mode" vs "🌐 Live Data"
 
-Use tools to create files. Always create complete, functional code that works even without API access."""
+Use tools to create files. Always create complete, functional code that works even without API access.
+
+**Batch your tool calls:** issue every create_file call the task needs in a single response rather than one file per turn. The calls run in parallel, and each extra turn costs a full round-trip."""
+
+    _SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
+
+    def get_system_prompt(self) -> str:
+        return self.SYSTEM_PROMPT
+
+    def _elide_payload(self, payload: str) -> str:
+        """Replace long string fields of a JSON payload with a short note"""
+        # Parsed strictly: JSON quoted inside a file body must not stand in for the payload
+        try:
+            data = _loads(payload)
+        except ValueError:
+            return payload
+        if not isinstance(data, dict):
+            return payload
+
+        for key, value in data.items():
+            if isinstance(value, str) and len(value) > self.MAX_PAYLOAD_CHARS:
+                data[key] = f"<{len(value)} characters elided>"
+            elif isinstance(value, list) and all(isinstance(item, str) for item in value):
+                # create_file_parts content
+                size = sum(len(item) for item in value)
+                if size > self.MAX_PAYLOAD_CHARS:
+                    data[key] = f"<{len(value)} parts, {size} characters elided>"
+        return _dumps(data)
+
+    def _elide_old_payloads(self, messages: List[Dict[str, Any]], head_end: int):
+        """
+        Shrink file bodies in tool calls and results of older turns, in place
+
+        The last FULL_PAYLOAD_TURNS assistant turns keep their payloads;
+        earlier create_file contents and read_file results are reduced to
+        their metadata, since the files themselves are already on disk.
+        """
+        turn_starts = [i for i in range(head_end, len(messages)) if messages[i]["role"] == "assistant"]
+        if len(turn_starts) <= self.FULL_PAYLOAD_TURNS:
+            return
+
+        for i in range(head_end, turn_starts[-self.FULL_PAYLOAD_TURNS]):
+            message = messages[i]
+            if message["role"] == "tool" and len(message["content"]) > self.MAX_PAYLOAD_CHARS:
+                messages[i] = dict(message, content=self._elide_payload(message["content"]))
+            elif message.get("tool_calls"):
+                tool_calls = []
+                for tc in message["tool_calls"]:
+                    arguments = tc["function"]["arguments"]
+                    if len(arguments) > self.MAX_PAYLOAD_CHARS:
+                        tc = dict(tc, function=dict(tc["function"], arguments=self._elide_payload(arguments)))
+                    tool_calls.append(tc)
+                messages[i] = dict(message, tool_calls=tool_calls)
+
+    async def _compact_history(self, messages: List[Dict[str, Any]], head_end: int) -> List[Dict[str, Any]]:
+        """
+        Summarize older tool-calling turns once they grow too large
+
+        The first head_end messages (system prompt and task) and the most
+        recent assistant turn with its tool results are kept verbatim;
+        everything in between, including any earlier summary, is replaced by
+        a short LLM-written summary. Only that middle counts toward
+        HISTORY_TOKEN_LIMIT, since summarizing cannot shrink the rest.
+        """
+        tail_start = max(
+            (i for i, m in enumerate(messages) if m["role"] == "assistant"),
+            default=head_end
+        )
+        middle = messages[head_end:tail_start]
+        if not middle or count_message_tokens(middle) <= self.HISTORY_TOKEN_LIMIT:
+            return messages
+
+        lines = []
+        for message in middle:
+            if message["role"] == "assistant":
+                if message.get("content"):
+                    lines.append(f"assistant: {message['content'][:500]}")
+                for tc in message.get("tool_calls") or []:
+                    lines.append(f"assistant called {tc['function']['name']}: {tc['function']['arguments'][:200]}")
+            else:
+                lines.append(f"{message['role']}: {(message.get('content') or '')[:300]}")
+
+        response = await self.llm_client.achat_completion(
+            messages=[{
+                "role": "user",
+                "content": "Summarize this code generation progress in a few bullet points: "
+                           "files created, decisions made, and what remains.\n\n" + "\n".join(lines)
+            }],
+            temperature=0,
+            max_tokens=300
+        )
+
+        if not response["success"] or not response["content"]:
+            self.logger.warning("History summarization failed, keeping full history")
+            return messages
+
+        self.logger.info("Summarized %s earlier messages", len(middle))
+        summary = {"role": "user", "content": f"Summary of earlier progress:\n{response['content']}"}
+        return messages[:head_end] + [summary] + messages[tail_start:]
 
-    def execute(self, task: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Execute code generation task"""
+    async def aexecute(
+            self,
+            task: Dict[str, Any],
+            context: Optional[Dict[str, Any]] = None,
+            self_review: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Execute code generation task
+
+        With self_review, the agent ends by reviewing its own code and the
+        parsed review is returned as "evaluation" (absent if unparseable).
+        """
         task_id = task.get("task_id", "unknown")
-        self.logger.info(f"Starting code generation for task: {task_id}")
+        self.logger.info("Starting code generation for task: %s", task_id)
 
         # Reset conversation for each task
         self.reset_conversation()
@@ -355,114 +756,160 @@ Implementation details: {task.get('implementation_details', 'None')}
 Generate complete, working code. Use the create_file tool to create each file.
 Make sure the code is production-ready with proper error handling and user feedback."""
 
-        messages = [
-            {"role": "system", "content": self.get_system_prompt()},
-            {"role": "user", "content": task_description}
-        ]
+        messages = [self._SYSTEM_MSG]
 
         if context:
+            # The plan is the same for every task, so it goes ahead of the task
+            # message to keep the provider's cached prompt prefix shared
+            dependencies = context.get("completed_dependencies")
+            shared = {k: v for k, v in context.items() if k != "completed_dependencies"}
             messages.append({
                 "role": "user",
-                "content": f"Additional context:\n{json.dumps(context, indent=2)}"
+                "content": f"Additional context:\n{_dumps(shared, indent=True)}"
             })
+            if dependencies:
+                task_description += f"\n\nFiles created by completed dependencies:\n{_dumps(dependencies, indent=True)}"
+
+        if self_review:
+            task_description += self.SELF_REVIEW_PROMPT
+
+        messages.append({"role": "user", "content": task_description})
 
-        # Execute with tool calling
+        result = await self._run_tool_loop(messages, head_end=len(messages), created_files=[])
+
+        if self_review and result["success"] and result.get("final_message"):
+            try:
+                evaluation = _extract_json(result["final_message"])
+            except ValueError:
+                evaluation = None
+            if isinstance(evaluation, dict) and "overall_quality" in evaluation:
+                result["evaluation"] = evaluation
+            else:
+                self.logger.warning("Could not parse self-review for task %s", task_id)
+
+        return result
+
+    async def _apply_turn(
+            self,
+            messages: List[Dict[str, Any]],
+            response: Dict[str, Any],
+            tool_futures: List["asyncio.Future"],
+            created_files: List[str]
+    ) -> bool:
+        """
+        Record a successful turn and its tool results in the message history
+
+        Returns:
+            True if the turn made tool calls and the conversation should continue
+        """
+        # Add assistant message to history
+        assistant_content = response["content"] or ""
+        if response["tool_calls"]:
+            # Format tool calls for message history
+            formatted_tool_calls = []
+            for tc in response["tool_calls"]:
+                try:
+                    formatted_tool_calls.append({
+                        "id": tc["id"],
+                        "type": tc["type"],
+                        "function": {
+                            "name": tc["function"]["name"],
+                            "arguments": tc["function"].get("arguments_raw") or _dumps(tc["function"]["arguments"])
+                        }
+                    })
+                except Exception as e:
+                    self.logger.warning("Failed to format tool call: %s", e)
+                    continue
+
+            messages.append({
+                "role": "assistant",
+                "content": assistant_content,
+                "tool_calls": formatted_tool_calls
+            })
+        else:
+            messages.append({
+                "role": "assistant",
+                "content": assistant_content
+            })
+
+        # If no tool calls, we're done
+        if not response["tool_calls"]:
+            self.logger.info("Code generation completed")
+            return False
+
+        # Wait for the concurrently running tool calls; gather keeps the LLM's call order
+        results = await asyncio.gather(*tool_futures)
+
+        for tool_call, result in zip(response["tool_calls"], results):
+            tool_name = tool_call["function"]["name"]
+            tool_args = tool_call["function"]["arguments"]
+
+            # Track created files
+            if tool_name in ("create_file", "create_file_parts") and result.get("success"):
+                created_files.append(tool_args.get("file_path"))
+            elif tool_name == "copy_file" and result.get("success"):
+                created_files.append(tool_args.get("dst_path"))
+
+            # Add tool result to messages
+            messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "content": result if isinstance(result, str) else _dumps(result)
+            })
+
+        return True
+
+    async def _run_tool_loop(
+            self,
+            messages: List[Dict[str, Any]],
+            head_end: int,
+            created_files: List[str],
+            iteration: int = 0
+    ) -> Dict[str, Any]:
+        """Keep calling the LLM and running its tool calls until it stops calling tools"""
         max_iterations = 10
-        iteration = 0
-        created_files = []
+
+        # Tool set is static for the whole task
+        tools = self.tool_manager.get_all_tools()
 
         while iteration < max_iterations:
             iteration += 1
-            self.logger.info(f"Iteration {iteration}/{max_iterations}")
-
-            # Get all available tools
-            tools = self.tool_manager.get_all_tools()
+            self.logger.info("Iteration %s/%s", iteration, max_iterations)
 
-            # Call LLM with tools
-            response = self.llm_client.retry_chat_completion(
-                messages=messages,
-                tools=tools,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
-            )
+            # Call LLM with tools; tool calls start running as they arrive
+            response, tool_futures = await self._aturn(messages, tools)
 
             if not response["success"]:
-                self.logger.error(f"Code generation failed: {response.get('error')}")
+                await asyncio.gather(*tool_futures)
+                self.logger.error("Code generation failed: %s", response.get('error'))
                 return {
                     "success": False,
                     "error": response.get("error"),
                     "created_files": created_files
                 }
 
-            # Add assistant message to history
-            assistant_content = response["content"] or ""
-            if response["tool_calls"]:
-                # Format tool calls for message history
-                formatted_tool_calls = []
-                for tc in response["tool_calls"]:
-                    try:
-                        formatted_tool_calls.append({
-                            "id": tc["id"],
-                            "type": tc["type"],
-                            "function": {
-                                "name": tc["function"]["name"],
-                                "arguments": json.dumps(tc["function"]["arguments"], ensure_ascii=False)
-                            }
-                        })
-                    except Exception as e:
-                        self.logger.warning(f"Failed to format tool call: {str(e)}")
-                        continue
-
-                messages.append({
-                    "role": "assistant",
-                    "content": assistant_content,
-                    "tool_calls": formatted_tool_calls
-                })
-            else:
-                messages.append({
-                    "role": "assistant",
-                    "content": assistant_content
-                })
-
-            # If no tool calls, we're done
-            if not response["tool_calls"]:
-                self.logger.info("Code generation completed")
+            if not await self._apply_turn(messages, response, tool_futures, created_files):
                 break
 
-            # Execute tool calls
-            for tool_call in response["tool_calls"]:
-                tool_name = tool_call["function"]["name"]
-                tool_args = tool_call["function"]["arguments"]
-
-                self.logger.info(f"Executing tool: {tool_name}")
-
-                # Execute tool
-                result = self.tool_manager.execute_tool(tool_name, tool_args)
-
-                # Track created files
-                if tool_name == "create_file" and result.get("success"):
-                    created_files.append(tool_args.get("file_path"))
-
-                # Add tool result to messages
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call["id"],
-                    "content": json.dumps(result)
-                })
+            # Keep the resent prompt bounded across iterations
+            self._elide_old_payloads(messages, head_end)
+            messages = await self._compact_history(messages, head_end)
 
+        # Only a closing reply counts; a loop cut off at max_iterations ends on a tool turn
+        last = messages[-1] if messages else {}
+        final = last.get("role") == "assistant" and not last.get("tool_calls")
         return {
             "success": True,
             "created_files": created_files,
             "iterations": iteration,
-            "final_message": messages[-1].get("content") if messages else None
+            "final_message": last.get("content") if final else None
         }
 
 
 class CodeEvaluationAgent(BaseAgent):
     """Agent responsible for evaluating code quality and functionality"""
 
-    def get_system_prompt(self) -> str:
-        return """You are a Senior Code Reviewer and Quality Assurance Engineer.
+    SYSTEM_PROMPT = """You are a Senior Code Reviewer and Quality Assurance Engineer.
 
 Your responsibilities:
 1. Review code for correctness, quality, and best practices
@@ -504,50 +951,71 @@ Provide your evaluation as a JSON object:
 
 Be thorough but fair in your evaluation."""
 
-    def execute(self, task: Dict[str, Any], files: List[str], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Execute code evaluation"""
-        self.logger.info(f"Starting code evaluation for {len(files)} files")
+    _SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
 
-        # Reset conversation
-        self.reset_conversation()
+    def get_system_prompt(self) -> str:
+        return self.SYSTEM_PROMPT
+
+    # Largest combined file content (tokens) evaluated in one batched request
+    MAX_BATCH_TOKENS = 12000
+    # Reply tokens reserved per task in a batched request; the batch's total
+    # must fit the model's max_output_tokens
+    BATCH_OUTPUT_TOKENS_PER_TASK = 1500
+
+    async def _read_files(self, files: List[str]) -> Dict[str, str]:
+        """Read files concurrently on the default executor, skipping unreadable ones"""
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*[
+            loop.run_in_executor(None, self.tool_manager.execute_tool, "read_file", {"file_path": file_path})
+            for file_path in files
+        ])
 
-        # Read all files
         file_contents = {}
-        for file_path in files:
-            result = self.tool_manager.execute_tool("read_file", {"file_path": file_path})
+        for file_path, result in zip(files, results):
             if result.get("success"):
                 file_contents[file_path] = result.get("content", "")
             else:
-                self.logger.warning(f"Could not read file: {file_path}")
-
-        # Build evaluation request
-        evaluation_request = f"""Evaluate the code for this task:
+                self.logger.warning("Could not read file: %s", file_path)
+        return file_contents
 
-Task: {task.get('title')}
+    @staticmethod
+    def _task_request(task: Dict[str, Any], file_contents: Dict[str, str]) -> str:
+        """Describe a task and its files for review, in one join instead of repeated concatenation"""
+        parts = [f"""Task: {task.get('title')}
 Description: {task.get('description')}
 Requirements: {task.get('implementation_details', 'See description')}
 
 Files created: {len(file_contents)}
 
-"""
+"""]
+        parts.extend(f"\n--- {file_path} ---\n{content}\n" for file_path, content in file_contents.items())
+        return "".join(parts)
+
+    async def aexecute(self, task: Dict[str, Any], files: List[str], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Execute code evaluation"""
+        self.logger.info("Starting code evaluation for %s files", len(files))
 
-        for file_path, content in file_contents.items():
-            evaluation_request += f"\n--- {file_path} ---\n{content}\n"
+        # Reset conversation
+        self.reset_conversation()
+
+        file_contents = await self._read_files(files)
+        evaluation_request = "Evaluate the code for this task:\n\n" + self._task_request(task, file_contents)
 
         messages = [
-            {"role": "system", "content": self.get_system_prompt()},
+            self._SYSTEM_MSG,
             {"role": "user", "content": evaluation_request}
         ]
 
         # Call LLM
-        response = self.llm_client.retry_chat_completion(
+        response = await self._acomplete(
             messages=messages,
             temperature=self.temperature,
-            max_tokens=self.max_tokens
+            max_tokens=self.max_tokens,
+            response_format=_JSON_RESPONSE_FORMAT
         )
 
         if not response["success"]:
-            self.logger.error(f"Evaluation failed: {response.get('error')}")
+            self.logger.error("Evaluation failed: %s", response.get('error'))
             return {
                 "success": False,
                 "error": response.get("error"),
@@ -558,23 +1026,9 @@ Files created: {len(file_contents)}
         try:
             content = response["content"]
 
-            # Extract JSON from response
-            if "```json" in content:
-                json_start = content.find("```json") + 7
-                json_end = content.find("```", json_start)
-                json_str = content[json_start:json_end].strip()
-            elif "```" in content:
-                json_start = content.find("```") + 3
-                json_end = content.find("```", json_start)
-                json_str = content[json_start:json_end].strip()
-            else:
-                json_start = content.find("{")
-                json_end = content.rfind("}") + 1
-                json_str = content[json_start:json_end].strip()
-
-            evaluation = json.loads(json_str)
+            evaluation = _extract_json(content)
 
-            self.logger.info(f"Evaluation completed: {evaluation.get('overall_quality')}")
+            self.logger.info("Evaluation completed: %s", evaluation.get('overall_quality'))
 
             return {
                 "success": True,
@@ -583,10 +1037,235 @@ Files created: {len(file_contents)}
             }
 
         except json.JSONDecodeError as e:
-            self.logger.error(f"Failed to parse evaluation JSON: {str(e)}")
+            self.logger.error("Failed to parse evaluation JSON: %s", e)
             return {
                 "success": False,
                 "error": f"Failed to parse evaluation: {str(e)}",
                 "evaluation": None,
                 "raw_response": response["content"]
             }
+
+    def _batch_groups(self, requests: List[str]) -> List[List[int]]:
+        """
+        Split task indexes into consecutive groups that fit one batched request
+
+        A group stays within MAX_BATCH_TOKENS of file content, and its reply
+        budget stays within the model's max_output_tokens.
+        """
+        per_task = min(self.max_tokens, self.BATCH_OUTPUT_TOKENS_PER_TASK)
+        output_limit = self.llm_client.max_output_tokens
+        max_group = max(1, output_limit // per_task) if output_limit else len(requests)
+
+        groups, group, group_tokens = [], [], 0
+        for idx, request in enumerate(requests):
+            tokens = count_tokens(request)
+            if group and (len(group) >= max_group or group_tokens + tokens > self.MAX_BATCH_TOKENS):
+                groups.append(group)
+                group, group_tokens = [], 0
+            group.append(idx)
+            group_tokens += tokens
+        if group:
+            groups.append(group)
+        return groups
+
+    async def _aevaluate_group(self, tasks: List[Dict[str, Any]], requests: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Evaluate a group of tasks in one request; returns evaluations by task_id"""
+        self.logger.info("Starting batched code evaluation for %s tasks", len(tasks))
+
+        parts = [f"""Evaluate the code for each of these {len(tasks)} tasks separately.
+Respond with a JSON object {{"evaluations": [...]}} holding one evaluation per task, each in the format above plus the task's "task_id".
+"""]
+        parts.extend(
+            f"\n=== task_id: {task.get('task_id')} ===\n{request}"
+            for task, request in zip(tasks, requests)
+        )
+        response = await self._acomplete(
+            messages=[self._SYSTEM_MSG, {"role": "user", "content": "".join(parts)}],
+            temperature=self.temperature,
+            max_tokens=min(self.max_tokens, self.BATCH_OUTPUT_TOKENS_PER_TASK) * len(tasks),
+            response_format=_JSON_RESPONSE_FORMAT
+        )
+
+        evaluations: Dict[str, Dict[str, Any]] = {}
+        if response["success"]:
+            try:
+                for evaluation in _extract_json(response["content"]).get("evaluations", []):
+                    if isinstance(evaluation, dict) and "task_id" in evaluation:
+                        evaluations[str(evaluation["task_id"])] = evaluation
+            except (json.JSONDecodeError, AttributeError) as e:
+                self.logger.warning("Failed to parse batched evaluation, evaluating per task: %s", e)
+        else:
+            self.logger.warning("Batched evaluation failed, evaluating per task: %s", response.get('error'))
+        return evaluations
+
+    async def aexecute_batch(
+            self,
+            tasks: List[Dict[str, Any]],
+            context: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Evaluate several tasks' files in as few LLM requests as fit
+
+        Tasks are grouped so each request stays within MAX_BATCH_TOKENS of
+        file content and within the model's output limit; the reviewer
+        returns one evaluation per task_id. Tasks missing from a reply, or
+        left alone in a group, fall back to concurrent per-task evaluation.
+
+        Returns:
+            One aexecute-style result per task, in order
+        """
+        contents = await asyncio.gather(*[self._read_files(task.get("files", [])) for task in tasks])
+        requests = [self._task_request(task, files) for task, files in zip(tasks, contents)]
+
+        groups = [group for group in self._batch_groups(requests) if len(group) > 1]
+        evaluations: Dict[str, Dict[str, Any]] = {}
+        for group_evaluations in await asyncio.gather(*[
+            self._aevaluate_group([tasks[idx] for idx in group], [requests[idx] for idx in group])
+            for group in groups
+        ]):
+            evaluations.update(group_evaluations)
+
+        results = [
+            {"success": True, "evaluation": evaluations.get(str(task.get("task_id")))}
+            for task in tasks
+        ]
+        missing = [idx for idx, result in enumerate(results) if result["evaluation"] is None]
+        fallback = await asyncio.gather(*[
+            self.aexecute(task=tasks[idx], files=tasks[idx].get("files", []), context=context)
+            for idx in missing
+        ])
+        for idx, result in zip(missing, fallback):
+            results[idx] = result
+
+        return results
+
+
+class MultiStageAgent(CodeGenerationAgent):
+    """
+    Agent that plans a project and starts coding it in the same conversation
+
+    The first turn emits the plan between <PLAN> tags and, for small
+    projects, already issues create_file calls, saving the separate planning
+    round-trip. Larger plans are returned unfused for the regular
+    per-task coding phase.
+    """
+
+    # Largest plan (task count, task text tokens) still coded in this conversation
+    MAX_FUSED_TASKS = 3
+    MAX_FUSED_PLAN_TOKENS = 1000
+
+    # Planning half of the prompt; unlike ProjectPlanningAgent's it sets no task count,
+    # which the fusion rules below decide
+    PLANNING_PROMPT = """You are a Senior Software Architect who plans frontend projects and then builds them.
+
+When planning:
+- Break the requirements into as few clear, actionable tasks as the project really needs
+- Prefer native HTML, vanilla JavaScript, jQuery and CDN-hosted Bootstrap; choose the simplest solution that works
+- For API-dependent projects, make Task 1 API testing and validation, assume browser CORS restrictions, and plan sample data as a fallback
+- Plan error handling and user feedback (loading states, error messages, live vs. sample data indicators)
+- For each task give its ID, title, description, files to create, key implementation details and dependencies
+
+The plan is a JSON object with this structure:
+{
+  "project_overview": "Brief description of the project",
+  "architecture": "High-level architecture description focusing on frontend",
+  "api_considerations": "Special notes about API usage, CORS issues, fallback strategies",
+  "technology_stack": ["List of technologies to use"],
+  "tasks": [
+    {
+      "task_id": "T1",
+      "title": "...",
+      "description": "...",
+      "files": ["..."],
+      "implementation_details": "...",
+      "dependencies": [],
+      "priority": "CRITICAL|HIGH|MEDIUM|LOW"
+    }
+  ],
+  "file_structure": {"path": "purpose"}
+}"""
+
+    SYSTEM_PROMPT = PLANNING_PROMPT + "\n\n" + CodeGenerationAgent.SYSTEM_PROMPT + """
+
+**PLAN AND BUILD IN ONE CONVERSATION:**
+- First write your plan JSON between <PLAN> and </PLAN> tags in your reply
+- If the project needs at most 3 tasks, use that many tasks and, in the same reply, start creating the files with the create_file tool; continue until every task is complete
+- If the project needs more than 3 tasks, output only the plan and make no tool calls"""
+
+    _SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
+
+    def get_system_prompt(self) -> str:
+        return self.SYSTEM_PROMPT
+
+    def _is_small_plan(self, plan: Dict[str, Any]) -> bool:
+        tasks = plan.get("tasks", [])
+        return (
+            isinstance(tasks, list)
+            and len(tasks) <= self.MAX_FUSED_TASKS
+            and count_tokens(_dumps(tasks)) < self.MAX_FUSED_PLAN_TOKENS
+        )
+
+    async def aexecute(self, task: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Plan the project and, if the plan is small, generate its code"""
+        self.logger.info("Starting fused planning for task: %s...", task[:100])
+
+        messages = [
+            self._SYSTEM_MSG,
+            {"role": "user", "content": f"Plan and build the following project:\n\n{task}"}
+        ]
+
+        if context:
+            messages.append({
+                "role": "user",
+                "content": f"Additional context:\n{_dumps(context, indent=True)}"
+            })
+
+        head_end = len(messages)
+        # Tool calls wait until the plan is known to be small enough to fuse
+        response, _ = await self._aturn(messages, self.tool_manager.get_all_tools(), start_tools=False)
+
+        if not response["success"]:
+            self.logger.error("Planning failed: %s", response.get('error'))
+            return {
+                "success": False,
+                "error": response.get("error"),
+                "plan": None
+            }
+
+        content = response["content"] or ""
+        match = _PLAN_BLOCK_RE.search(content)
+        try:
+            plan = _extract_json(match.group(1) if match else content)
+            if not isinstance(plan, dict):
+                raise ValueError(f"expected a JSON object, got {type(plan).__name__}")
+        except ValueError as e:
+            self.logger.error("Failed to parse plan JSON: %s", e)
+            return {
+                "success": False,
+                "error": f"Failed to parse plan: {str(e)}",
+                "plan": None,
+                "raw_response": content
+            }
+
+        self.logger.info("Successfully parsed plan with %s tasks", len(plan.get('tasks') or []))
+
+        if not self._is_small_plan(plan):
+            # Any tool calls in the reply are dropped; the tasks are coded separately
+            if response["tool_calls"]:
+                self.logger.info("Plan too large to fuse, skipping %s tool calls", len(response["tool_calls"]))
+            return {
+                "success": True,
+                "plan": plan,
+                "fused": False,
+                "raw_response": content
+            }
+
+        tool_futures = [self._start_tool(tc) for tc in response["tool_calls"]]
+        created_files = []
+        if await self._apply_turn(messages, response, tool_futures, created_files):
+            result = await self._run_tool_loop(messages, head_end, created_files, iteration=1)
+        else:
+            result = {"success": True, "created_files": created_files, "iterations": 1}
+
+        result.update(plan=plan, fused=True, raw_response=content)
+        return result
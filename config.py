@@ -17,21 +17,43 @@ except ImportError:
 
 # LLM API Configuration
 # You can use any of these models - just set your API key and base URL
+# prompt_cache: how static system prompts are marked for provider-side caching
+#   "key"       - send a stable prompt_cache_key per system prompt (OpenAI)
+#   "ephemeral" - send the system prompt as a cache_control block (Anthropic-compatible)
+#   ""          - disabled
+# context_window: model context size in tokens, used to cap max_tokens to what
+#   still fits after the prompt (0 disables the cap)
+# json_mode: whether the model accepts response_format={"type": "json_object"};
+#   without it JSON replies are parsed from plain text
+# max_output_tokens: most tokens the model generates per reply; larger
+#   max_tokens requests are clamped to it (0 disables the clamp)
 LLM_CONFIGS = {
     "deepseek": {
         "api_key": os.getenv("DEEPSEEK_API_KEY", ""),
         "base_url": "https://api.deepseek.com/v1",
-        "model": "deepseek-chat"
+        "model": "deepseek-chat",
+        "prompt_cache": "",  # DeepSeek caches repeated prefixes automatically
+        "context_window": 64000,
+        "json_mode": True,
+        "max_output_tokens": 8192
     },
     "openai": {
         "api_key": os.getenv("OPENAI_API_KEY", ""),
         "base_url": "https://api.openai.com/v1",
-        "model": "gpt-4"
+        "model": "gpt-4",
+        "prompt_cache": "key",
+        "context_window": 8192,
+        "json_mode": False,  # gpt-4 rejects json_object; enable for gpt-4o and later
+        "max_output_tokens": 4096
     },
     "custom": {
         "api_key": os.getenv("LLM_API_KEY", ""),
         "base_url": os.getenv("LLM_BASE_URL", "https://api.openai.com/v1"),
-        "model": os.getenv("LLM_MODEL", "gpt-4")
+        "model": os.getenv("LLM_MODEL", "gpt-4"),
+        "prompt_cache": os.getenv("LLM_PROMPT_CACHE", ""),
+        "context_window": int(os.getenv("LLM_CONTEXT_WINDOW", "0")),
+        "json_mode": os.getenv("LLM_JSON_MODE", "").lower() in ("1", "true", "yes"),
+        "max_output_tokens": int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "4096"))
     }
 }
 
@@ -43,7 +65,7 @@ DEFAULT_PROVIDER = "custom"
 AGENT_CONFIG = {
     "planning_agent": {
         "name": "Project Planning Agent",
-        "temperature": 0.7,
+        "temperature": 0,
         "max_tokens": 4000
     },
     "coding_agent": {
@@ -53,7 +75,7 @@ AGENT_CONFIG = {
     },
     "evaluation_agent": {
         "name": "Code Evaluation Agent",
-        "temperature": 0.5,
+        "temperature": 0,
         "max_tokens": 3000
     }
 }
@@ -62,5 +84,15 @@ AGENT_CONFIG = {
 LOG_DIR = "./logs"
 LOG_FILE = "agent_system.log"
 
+# LLM request limits: concurrent requests per event loop, and requests per
+# minute across the process (0 for no limit)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_RPM = float(os.getenv("LLM_RPM", "0"))
+
 # Output Configuration
 OUTPUT_DIR = "./output"
+
+# Persistent response cache for deterministic LLM calls (opt-in, empty to disable)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+# Plans reused for repeated or near-identical task descriptions (opt-in, empty to disable)
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", "")
@@ -0,0 +1,130 @@
+"""
+Deterministic fixes for common issues in generated code
+Patches pattern-matchable problems (missing CORS setup, HTTP calls without
+timeouts) in place, without an LLM round-trip
+"""
+
+import os
+import ast
+import re
+import logging
+from typing import List, Dict, Callable, Optional
+from tools import ToolManager
+
+
+logger = logging.getLogger("DeterministicFixers")
+
+# Seconds added as the timeout of requests calls that have none
+HTTP_TIMEOUT = 10
+
+_REQUESTS_METHODS = {"get", "post", "put", "patch", "delete", "head", "options", "request"}
+
+_FLASK_APP_RE = re.compile(r"^(\w+)\s*=\s*Flask\(.*\)[ \t]*$", re.MULTILINE)
+_FLASK_IMPORT_RE = re.compile(r"^(?:from flask import .*|import flask)[ \t]*$", re.MULTILINE)
+
+
+def fix_cors(source: str) -> Optional[str]:
+    """Enable flask_cors on a Flask app that is created without it"""
+    if "CORS(" in source:
+        return None
+
+    app_match = _FLASK_APP_RE.search(source)
+    if app_match is None:
+        return None
+
+    # Wrap the app right after it is created, then import CORS next to flask
+    source = f"{source[:app_match.end()]}\nCORS({app_match.group(1)}){source[app_match.end():]}"
+    import_match = _FLASK_IMPORT_RE.search(source)
+    insert_at = import_match.end() + 1 if import_match else app_match.start()
+    return f"{source[:insert_at]}from flask_cors import CORS\n{source[insert_at:]}"
+
+
+def fix_missing_timeouts(source: str) -> Optional[str]:
+    """Add a timeout to requests calls that would otherwise wait forever"""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+
+    calls = [
+        node for node in ast.walk(tree)
+        if isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "requests"
+        and node.func.attr in _REQUESTS_METHODS
+        # **kwargs may already carry a timeout
+        and not any(kw.arg in ("timeout", None) for kw in node.keywords)
+    ]
+    if not calls:
+        return None
+
+    # AST columns are UTF-8 byte offsets; edit bottom-up so earlier offsets stay valid
+    lines = [line.encode("utf-8") for line in source.splitlines(keepends=True)]
+    for call in sorted(calls, key=lambda c: (c.end_lineno, c.end_col_offset), reverse=True):
+        line = lines[call.end_lineno - 1]
+        close = call.end_col_offset - 1
+        before = (b"".join(lines[:call.end_lineno - 1]) + line[:close]).rstrip()
+        if before.endswith(b"("):
+            separator = b""
+        elif before.endswith(b","):
+            separator = b" "
+        else:
+            separator = b", "
+        lines[call.end_lineno - 1] = line[:close] + separator + b"timeout=%d" % HTTP_TIMEOUT + line[close:]
+
+    fixed = b"".join(lines).decode("utf-8")
+    try:
+        ast.parse(fixed)
+    except SyntaxError:
+        logger.warning("Timeout fix produced invalid code, leaving file unchanged")
+        return None
+    return fixed
+
+
+# Fixers applied to generated files, by extension, in order
+FIXERS: Dict[str, List[Callable[[str], Optional[str]]]] = {
+    ".py": [fix_cors, fix_missing_timeouts]
+}
+
+
+def apply_fixers(files: List[str], tool_manager: ToolManager) -> List[str]:
+    """
+    Apply the deterministic fixers to generated files in place
+
+    Returns:
+        Paths of the files that were changed
+    """
+    fixable = []
+    for file_path in files:
+        fixers = FIXERS.get(os.path.splitext(file_path)[1].lower())
+        if fixers:
+            fixable.append((file_path, fixers))
+
+    # Read every candidate at once
+    reads = tool_manager.execute_tools_batch(
+        [("read_file", {"file_path": file_path}) for file_path, _ in fixable]
+    )
+
+    fixed = []
+    for (file_path, fixers), result in zip(fixable, reads):
+        if not result.get("success"):
+            continue
+
+        source = original = result["content"]
+        for fixer in fixers:
+            source = fixer(source) or source
+
+        if source != original:
+            fixed.append({"file_path": file_path, "content": source})
+
+    if not fixed:
+        return []
+
+    # Write all patched files in one batch
+    result = tool_manager.execute_tool("create_files", {"files": fixed})
+    for failure in result.get("failed", []):
+        logger.warning("Could not write fixes to %s: %s", failure["file_path"], failure["message"])
+    for file_path in result.get("created", []):
+        logger.info("Applied deterministic fixes to %s", file_path)
+    return result.get("created", [])
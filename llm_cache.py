@@ -0,0 +1,416 @@
+"""
+Response caching for LLM calls
+Serves repeated or near-identical agent prompts without a network round-trip
+"""
+
+import os
+import re
+import copy
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    # Without embeddings the cache matches on normalized prompt text only
+    np = None
+    SentenceTransformer = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    """Collapse formatting-only differences (whitespace, case) in a prompt"""
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+def _fingerprint(scope: str, messages: List[Dict[str, Any]]) -> str:
+    """Hash the exact scope and messages for the exact-match tier"""
+    if orjson is not None:
+        payload = orjson.dumps([scope, messages], option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    else:
+        payload = json.dumps([scope, messages], sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def _dumps(data: Any) -> str:
+    """Serialize a cache entry to JSON text, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _loads(text: str) -> Any:
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def _content_text(message: Dict[str, Any]) -> str:
+    """Return the text of a message, whatever shape its content has"""
+    content = message.get("content") or ""
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+
+
+class SemanticCache:
+    """
+    Cache of successful LLM responses keyed by prompt similarity
+
+    Lookups first try an exact-match tier keyed by a blake2b hash of the
+    messages, which answers verbatim repeats without any scanning or
+    embedding. Entries older than ttl seconds (if set) are ignored.
+
+    Unless exact_only (the default), a fuzzy tier follows: entries are
+    scoped by agent name plus the exact (normalized) conversation prefix, so
+    only the final message is compared. It matches after lowercasing and
+    collapsing whitespace and, with sentence-transformers installed, at
+    cosine similarity >= threshold, so it can return a response written for
+    a different prompt; only enable it where that is acceptable.
+    """
+
+    def __init__(
+            self,
+            threshold: float = 0.9,
+            max_entries: int = 1000,
+            model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+            ttl: Optional[float] = None,
+            exact_only: bool = True
+    ):
+        self.threshold = threshold
+        self.exact_only = exact_only
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger("SemanticCache")
+
+        # fingerprint -> (expiry, response)
+        self._exact: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # scope -> list of (expiry, normalized prompt, embedding, response)
+        self._entries: "OrderedDict[Tuple[str, str], List[Tuple[float, str, Any, Dict[str, Any]]]]" = OrderedDict()
+        self._size = 0
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        """Load the embedding model on first use"""
+        if self._model is None and SentenceTransformer is not None:
+            try:
+                self._model = SentenceTransformer(self.model_name)
+            except Exception as e:
+                self.logger.warning("Embedding model unavailable, using exact matching: %s", e)
+                self._model = False
+        return self._model or None
+
+    def prewarm(self):
+        """Load the embedding model now instead of on the first lookup"""
+        if not self.exact_only:
+            self._get_model()
+
+    def _embed(self, text: str):
+        model = self._get_model()
+        if model is None:
+            return None
+        return model.encode(text, normalize_embeddings=True)
+
+    @staticmethod
+    def _split(scope: str, messages: List[Dict[str, Any]]) -> Tuple[Tuple[str, str], str]:
+        prefix = "\x1e".join(
+            f"{m.get('role')}:{_normalize(_content_text(m))}" for m in messages[:-1]
+        )
+        return (scope, prefix), _normalize(_content_text(messages[-1]))
+
+    def lookup(self, scope: str, messages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Return a cached response for these messages, or None"""
+        if not messages:
+            return None
+
+        now = time.monotonic()
+        fingerprint = _fingerprint(scope, messages)
+        with self._lock:
+            expiry, response = self._exact.get(fingerprint, (now, None))
+            if response is not None and expiry > now:
+                self._exact.move_to_end(fingerprint)
+                self.hits += 1
+                return response
+            if self.exact_only:
+                self.misses += 1
+                return None
+
+        key, prompt = self._split(scope, messages)
+
+        with self._lock:
+            candidates = [entry[1:] for entry in self._entries.get(key, ()) if entry[0] > now]
+
+        response = next((r for p, _, r in candidates if p == prompt), None)
+
+        if response is None and candidates:
+            embedding = self._embed(prompt)
+            if embedding is not None:
+                best_score = self.threshold
+                for _, other, cached in candidates:
+                    if other is None:
+                        continue
+                    score = float(embedding @ other)
+                    if score >= best_score:
+                        best_score, response = score, cached
+
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+
+        return response
+
+    def store(self, scope: str, messages: List[Dict[str, Any]], response: Dict[str, Any]):
+        """Cache a successful response for these messages"""
+        if not messages or not response.get("success"):
+            return
+
+        fingerprint = _fingerprint(scope, messages)
+        expiry = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+
+        with self._lock:
+            self._exact[fingerprint] = (expiry, response)
+            self._exact.move_to_end(fingerprint)
+            if len(self._exact) > self.max_entries:
+                self._exact.popitem(last=False)
+        if self.exact_only:
+            return
+
+        key, prompt = self._split(scope, messages)
+        embedding = self._embed(prompt)
+
+        with self._lock:
+            self._entries.setdefault(key, []).append((expiry, prompt, embedding, response))
+            self._entries.move_to_end(key)
+            self._size += 1
+
+            # Evict least recently used scopes once over capacity
+            while self._size > self.max_entries:
+                if len(self._entries) > 1:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+                else:
+                    self._entries[key].pop(0)
+                    self._size -= 1
+
+    def clear(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self._exact.clear()
+            self._entries.clear()
+            self._size = 0
+
+
+class DiskCache:
+    """
+    Persistent exact-match cache of successful LLM responses
+
+    Backed by a single SQLite file so cached responses survive restarts.
+    Keys are the same blake2b fingerprint the in-memory exact tier uses.
+    """
+
+    def __init__(self, path: str, ttl: float = 86400):
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger("DiskCache")
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, expires REAL NOT NULL, response TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def lookup(self, scope: str, messages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Return the stored response for these messages, or None"""
+        key = _fingerprint(scope, messages)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND expires > ?",
+                (key, time.time())
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return _loads(row[0])
+
+    def store(self, scope: str, messages: List[Dict[str, Any]], response: Dict[str, Any]):
+        """Persist a successful response for these messages"""
+        if not messages or not response.get("success"):
+            return
+
+        key = _fingerprint(scope, messages)
+        try:
+            payload = _dumps(response)
+        except (TypeError, ValueError) as e:
+            self.logger.warning("Response not serializable, skipping disk cache: %s", e)
+            return
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, expires, response) VALUES (?, ?, ?)",
+                (key, time.time() + self.ttl, payload)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Drop all persisted responses"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+def _valid_plan(plan: Any) -> bool:
+    """Check a cached plan still has the shape the orchestrator relies on"""
+    tasks = plan.get("tasks") if isinstance(plan, dict) else None
+    return bool(tasks) and isinstance(tasks, list) and all(
+        isinstance(task, dict) and "task_id" in task for task in tasks
+    )
+
+
+class PlanCache:
+    """
+    Persistent cache of project plans keyed by task description similarity
+
+    Plans are stored in SQLite alongside the embedding of their task
+    description and kept in memory for lookups. A description matches when
+    its normalized text is identical or, with sentence-transformers
+    installed, when its cosine similarity to a stored one is >= threshold.
+    Only plans stored under the same scope (the planning model) are
+    candidates, and plans older than ttl seconds (if set) are ignored.
+    Plans that fail a basic schema check are never returned.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            threshold: float = 0.92,
+            model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+            ttl: Optional[float] = None
+    ):
+        self.path = os.path.expanduser(path)
+        self.threshold = threshold
+        self.model_name = model_name
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger("PlanCache")
+        self._model = None
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plans "
+            "(task TEXT PRIMARY KEY, created REAL NOT NULL, embedding BLOB, plan TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+        # normalized task -> (created, embedding, plan)
+        self._plans: Dict[str, Tuple[float, Any, Dict[str, Any]]] = {}
+        for task, created, embedding, plan in self._conn.execute("SELECT task, created, embedding, plan FROM plans"):
+            if embedding is not None and np is not None:
+                embedding = np.frombuffer(embedding, dtype=np.float32)
+            else:
+                embedding = None
+            self._plans[task] = (created, embedding, _loads(plan))
+
+    def _embed(self, text: str):
+        if self._model is None and SentenceTransformer is not None:
+            try:
+                self._model = SentenceTransformer(self.model_name)
+            except Exception as e:
+                self.logger.warning("Embedding model unavailable, using exact matching: %s", e)
+                self._model = False
+        if not self._model:
+            return None
+        return self._model.encode(text, normalize_embeddings=True).astype(np.float32)
+
+    @staticmethod
+    def _key(scope: str, task_description: str) -> Tuple[str, str]:
+        return f"{scope}\x1e", _normalize(task_description)
+
+    def lookup(self, task_description: str, scope: str = "") -> Optional[Dict[str, Any]]:
+        """Return a copy of the plan stored for this or a near-identical task, or None"""
+        prefix, task = self._key(scope, task_description)
+        oldest = time.time() - self.ttl if self.ttl is not None else float("-inf")
+
+        with self._lock:
+            candidates = {
+                key: entry for key, entry in self._plans.items()
+                if entry[0] > oldest and key.startswith(prefix)
+            }
+
+        plan = candidates[prefix + task][2] if prefix + task in candidates else None
+        if plan is None and candidates:
+            embedding = self._embed(task)
+            if embedding is not None:
+                best_score = self.threshold
+                for _, other, cached in candidates.values():
+                    if other is None:
+                        continue
+                    score = float(embedding @ other)
+                    if score >= best_score:
+                        best_score, plan = score, cached
+
+        if plan is not None and not _valid_plan(plan):
+            self.logger.warning("Ignoring cached plan that fails validation")
+            plan = None
+
+        with self._lock:
+            if plan is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        # Callers edit plans as they run; the cached one must stay intact
+        return copy.deepcopy(plan)
+
+    def store(self, task_description: str, plan: Dict[str, Any], scope: str = ""):
+        """Persist the plan produced for a task description"""
+        if not _valid_plan(plan):
+            return
+
+        prefix, task = self._key(scope, task_description)
+        embedding = self._embed(task)
+        created = time.time()
+
+        with self._lock:
+            self._plans[prefix + task] = (created, embedding, copy.deepcopy(plan))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plans (task, created, embedding, plan) VALUES (?, ?, ?, ?)",
+                (prefix + task, created, embedding.tobytes() if embedding is not None else None,
+                 _dumps(plan))
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Drop all stored plans"""
+        with self._lock:
+            self._plans.clear()
+            self._conn.execute("DELETE FROM plans")
+            self._conn.commit()
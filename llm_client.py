@@ -5,39 +5,560 @@ Supports OpenAI-compatible APIs
 
 import json
 import time
+import atexit
+import random
+import hashlib
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
-from config import LLM_CONFIGS, DEFAULT_PROVIDER
+import threading
+import importlib.util
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from config import LLM_CONFIGS, DEFAULT_PROVIDER, LLM_MAX_CONCURRENCY, LLM_RPM
+from llm_cache import SemanticCache, DiskCache
+
+# HTTP/2 lets concurrent agent requests share one connection; needs the h2 package
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Connection pool shared by every LLMClient's synchronous API client
+_shared_http_client = None
+
+
+def _get_shared_http_client() -> httpx.Client:
+    """Create the process-wide sync HTTP client on first use"""
+    global _shared_http_client
+    if _shared_http_client is None:
+        _shared_http_client = httpx.Client(
+            http2=_HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=300.0),
+            timeout=httpx.Timeout(120.0, connect=5.0)
+        )
+        atexit.register(_shared_http_client.close)
+    return _shared_http_client
+
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard library parser
+    orjson = None
+
+try:
+    import tiktoken
+except ImportError:
+    # Token counts fall back to a characters-per-token estimate
+    tiktoken = None
+
+
+_encoding = None
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once; False if unavailable"""
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base") if tiktoken else False
+        except Exception:
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count (or estimate, without tiktoken) the tokens in a string"""
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4
+
+
+def count_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Count the prompt tokens of a message list, including tool call arguments"""
+    total = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            total += count_tokens(content)
+        for tc in message.get("tool_calls") or []:
+            total += count_tokens(str(tc["function"]["arguments"]))
+    return total
+
+
+# Client errors that fail the same way however often they are retried
+_NON_RETRYABLE_STATUS = {400, 401, 403, 404, 422}
+
+
+def _error_result(error: Exception, tool_calls: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Build a failed response dictionary, keeping what the retry logic needs"""
+    retry_after = None
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+
+    return {
+        "success": False,
+        "error": str(error),
+        "content": None,
+        "tool_calls": tool_calls or [],
+        "status_code": getattr(error, "status_code", None),
+        "retry_after": retry_after
+    }
+
+
+def _backoff_delay(result: Dict[str, Any], attempt: int, retry_delay: float) -> Optional[float]:
+    """
+    Seconds to wait before retrying a failed request, or None to stop retrying
+
+    Uses the server's Retry-After when given, otherwise full-jitter
+    exponential backoff capped at 60 seconds.
+    """
+    if result.get("status_code") in _NON_RETRYABLE_STATUS:
+        return None
+    if result.get("retry_after") is not None:
+        return result["retry_after"]
+    return random.uniform(0, min(60.0, retry_delay * (2 ** attempt)))
+
+
+class _RateLimiter:
+    """
+    Token bucket spacing requests to at most ``rpm`` per minute
+
+    Shared by the sync and async paths (and across event loops), so it
+    only hands out start times under a thread lock; callers do the waiting.
+    Up to ``burst`` requests may start back to back after an idle period.
+    """
+
+    def __init__(self, rpm: float, burst: int = 1):
+        self.interval = 60.0 / rpm
+        self.burst = max(1, burst)
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Claim the next start slot and return how long to wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next_start, now - (self.burst - 1) * self.interval)
+            self._next_start = start + self.interval
+        return max(0.0, start - now)
+
+    def wait(self):
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire(self):
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+# Headroom left for per-message framing tokens that count_message_tokens skips
+_CONTEXT_SAFETY_TOKENS = 64
+
+
+class _StreamAccumulator:
+    """Reassembles streamed chat completion deltas into content and tool calls"""
+
+    def __init__(self):
+        self._content_parts: List[str] = []
+        self._tool_calls: Dict[int, Dict[str, Any]] = {}
+        self._emitted = 0
+        self.finish_reason = None
+        # Reply text carried by the most recent chunk
+        self.content_delta: Optional[str] = None
+
+    @property
+    def content(self) -> Optional[str]:
+        return "".join(self._content_parts) if self._content_parts else None
+
+    def add(self, chunk) -> List[Tuple[str, str, str, str]]:
+        """
+        Apply one streamed chunk
+
+        Returns:
+            (id, type, name, raw_arguments) for tool calls that this chunk
+            proved complete - a call is complete once a later one starts
+        """
+        if not chunk.choices:
+            return []
+
+        self.content_delta = None
+        choice = chunk.choices[0]
+        if choice.finish_reason:
+            self.finish_reason = choice.finish_reason
+
+        delta = choice.delta
+        if delta is None:
+            return []
+
+        if delta.content:
+            self._content_parts.append(delta.content)
+            self.content_delta = delta.content
+
+        for tc in delta.tool_calls or []:
+            call = self._tool_calls.setdefault(tc.index, {
+                "id": None, "type": "function", "name": "", "arguments": []
+            })
+            if tc.id:
+                call["id"] = tc.id
+            if tc.type:
+                call["type"] = tc.type
+            if tc.function is not None:
+                if tc.function.name:
+                    call["name"] += tc.function.name
+                if tc.function.arguments:
+                    call["arguments"].append(tc.function.arguments)
+
+        # Every call before the newest index has finished streaming
+        return self._drain(len(self._tool_calls) - 1)
+
+    def finish(self) -> List[Tuple[str, str, str, str]]:
+        """Return the tool calls still pending when the stream ended"""
+        return self._drain(len(self._tool_calls))
+
+    def _drain(self, upto: int) -> List[Tuple[str, str, str, str]]:
+        ready = []
+        for index in sorted(self._tool_calls)[self._emitted:upto]:
+            call = self._tool_calls[index]
+            ready.append((call["id"], call["type"], call["name"], "".join(call["arguments"])))
+        self._emitted = max(self._emitted, upto)
+        return ready
 
 
 class LLMClient:
     """Client for LLM API interaction"""
 
-    def __init__(self, provider: str = DEFAULT_PROVIDER):
+    def __init__(
+            self,
+            provider: str = DEFAULT_PROVIDER,
+            max_parallel: int = LLM_MAX_CONCURRENCY,
+            cache: Optional[SemanticCache] = None,
+            disk_cache: Optional[DiskCache] = None,
+            rpm: float = LLM_RPM
+    ):
         self.provider = provider
         config = LLM_CONFIGS.get(provider, LLM_CONFIGS["custom"])
 
-        self.client = OpenAI(
-            api_key=config["api_key"],
-            base_url=config["base_url"],
-            timeout=120.0,  # 增加超时时间到120秒
-            max_retries=2,   # 限制重试次数为2次，避免无限重试
-            default_headers={
+        self._client_kwargs = {
+            "api_key": config["api_key"],
+            "base_url": config["base_url"],
+            "timeout": 120.0,  # 增加超时时间到120秒
+            "max_retries": 2,   # 限制重试次数为2次，避免无限重试
+            "default_headers": {
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36",
             }
-        )
+        }
+        # All clients share one pool so warm connections outlive any single instance
+        self.client = OpenAI(http_client=_get_shared_http_client(), **self._client_kwargs)
         self.model = config["model"]
+        self.prompt_cache = config.get("prompt_cache", "")
+        self.context_window = config.get("context_window", 0)
+        self.max_output_tokens = config.get("max_output_tokens", 0)
+        # response_format is only sent to models known to accept it
+        self.json_mode = config.get("json_mode", False)
+        self._tools_tokens = (None, 0)
+        # Deterministic (temperature 0) responses are served from these when set;
+        # the disk cache sits under the in-memory one and survives restarts
+        self.cache = cache
+        self.disk_cache = disk_cache
+        self._tools_fingerprint = (None, "")
         # print(config["api_key"],config["base_url"],config["model"])
         self.logger = logging.getLogger("LLMClient")
 
+        # Async client and concurrency guard for each event loop using this client
+        self.max_parallel = max_parallel
+        self._async_clients: Dict[asyncio.AbstractEventLoop, Tuple[AsyncOpenAI, asyncio.Semaphore]] = {}
+        self._async_lock = threading.Lock()
+        # Provider request budget; requests beyond it wait instead of drawing 429s
+        self._rate_limiter = _RateLimiter(rpm, burst=max_parallel) if rpm > 0 else None
+
+    def _get_async_client(self):
+        """Return the AsyncOpenAI client and semaphore bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            entry = self._async_clients.get(loop)
+            if entry is None:
+                # Loops that ended without aclose() cannot be reused; forget their clients
+                for closed in [other for other in self._async_clients if other.is_closed()]:
+                    del self._async_clients[closed]
+
+                http_client = httpx.AsyncClient(
+                    http2=_HTTP2_AVAILABLE,
+                    limits=httpx.Limits(
+                        max_connections=32,
+                        max_keepalive_connections=16,
+                        keepalive_expiry=60.0
+                    ),
+                    timeout=httpx.Timeout(self._client_kwargs["timeout"], connect=5.0)
+                )
+                entry = (
+                    AsyncOpenAI(http_client=http_client, **self._client_kwargs),
+                    asyncio.Semaphore(self.max_parallel)
+                )
+                self._async_clients[loop] = entry
+        return entry
+
+    async def aclose(self):
+        """
+        Close the running event loop's async client
+
+        Call once no request on this loop is in flight, before the loop
+        shuts down; clients of other loops are left alone.
+        """
+        with self._async_lock:
+            entry = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[0].close()
+
+    async def __aenter__(self) -> "LLMClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    @property
+    def cache_hits(self) -> int:
+        """Responses served from the client caches"""
+        return sum(c.hits for c in (self.cache, self.disk_cache) if c is not None)
+
+    @property
+    def cache_misses(self) -> int:
+        """Cacheable requests that had to go to the API"""
+        last_tier = self.disk_cache if self.disk_cache is not None else self.cache
+        return last_tier.misses if last_tier is not None else 0
+
+    def _cache_scope(
+            self,
+            temperature: float,
+            tools: Optional[List[Dict[str, Any]]],
+            response_format: Optional[Dict[str, Any]],
+            max_tokens: int,
+            tool_choice: str
+    ) -> Optional[str]:
+        """Cache scope for a request, or None if its response should not be cached"""
+        if (self.cache is None and self.disk_cache is None) or temperature != 0:
+            return None
+
+        tools_fingerprint = ""
+        if tools:
+            cached_tools, tools_fingerprint = self._tools_fingerprint
+            if cached_tools is not tools:
+                payload = json.dumps(tools, sort_keys=True).encode("utf-8")
+                tools_fingerprint = hashlib.blake2b(payload, digest_size=16).hexdigest()
+                self._tools_fingerprint = (tools, tools_fingerprint)
+
+        return (
+            f"{self._client_kwargs['base_url']}|{self.model}|{max_tokens}|{tool_choice}|"
+            f"{tools_fingerprint}|{response_format}"
+        )
+
+    def _cached_response(self, scope: str, messages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Look a request up in the memory cache, then on disk"""
+        if self.cache is not None:
+            cached = self.cache.lookup(scope, messages)
+            if cached is not None:
+                return cached
+
+        if self.disk_cache is not None:
+            cached = self.disk_cache.lookup(scope, messages)
+            if cached is not None:
+                # Promote to memory so repeats skip the disk read
+                if self.cache is not None:
+                    self.cache.store(scope, messages, cached)
+                return cached
+
+        return None
+
+    def _store_response(self, scope: str, messages: List[Dict[str, Any]], result: Dict[str, Any]):
+        """Save a fresh response in every configured cache"""
+        # A reply cut off by the token limit (or a filter) must not be replayed
+        if result.get("finish_reason") != "stop":
+            return
+        if self.cache is not None:
+            self.cache.store(scope, messages, result)
+        if self.disk_cache is not None:
+            self.disk_cache.store(scope, messages, result)
+
+    def _cap_max_tokens(
+            self,
+            messages: List[Dict[str, Any]],
+            tools: Optional[List[Dict[str, Any]]],
+            max_tokens: int
+    ) -> int:
+        """Shrink max_tokens to the model's output limit and to what fits in the context window after the prompt"""
+        if self.max_output_tokens:
+            max_tokens = min(max_tokens, self.max_output_tokens)
+        if not self.context_window:
+            return max_tokens
+
+        prompt_tokens = count_message_tokens(messages)
+        if tools:
+            # Tool schemas are static per ToolManager, so count them once
+            cached_tools, tools_tokens = self._tools_tokens
+            if cached_tools is not tools:
+                tools_tokens = count_tokens(json.dumps(tools))
+                self._tools_tokens = (tools, tools_tokens)
+            prompt_tokens += tools_tokens
+
+        available = self.context_window - prompt_tokens - _CONTEXT_SAFETY_TOKENS
+        if available <= 0:
+            # Leave max_tokens alone so the provider reports the real context overflow
+            self.logger.warning(
+                "Prompt of ~%s tokens leaves no room in the %s-token context window",
+                prompt_tokens, self.context_window
+            )
+            return max_tokens
+        return min(max_tokens, available)
+
+    def _build_request(
+            self,
+            messages: List[Dict[str, str]],
+            tools: Optional[List[Dict[str, Any]]],
+            temperature: float,
+            max_tokens: int,
+            tool_choice: str,
+            prompt_cache_key: Optional[str] = None,
+            response_format: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Build keyword arguments for a chat completion request"""
+        max_tokens = self._cap_max_tokens(messages, tools, max_tokens)
+
+        if self.prompt_cache == "ephemeral" and messages and messages[0]["role"] == "system":
+            # Anthropic-style prompt caching marks the static system prefix explicitly
+            system_message = {
+                "role": "system",
+                "content": [{
+                    "type": "text",
+                    "text": messages[0]["content"],
+                    "cache_control": {"type": "ephemeral"}
+                }]
+            }
+            messages = [system_message] + messages[1:]
+
+        kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+
+        if tools:
+            kwargs["tools"] = tools
+            kwargs["tool_choice"] = tool_choice
+
+        if response_format and self.json_mode:
+            kwargs["response_format"] = response_format
+
+        if self.prompt_cache == "key" and prompt_cache_key:
+            kwargs["extra_body"] = {"prompt_cache_key": prompt_cache_key}
+
+        return kwargs
+
+    def _drop_rejected_json_mode(self, error: Exception, kwargs: Optional[Dict[str, Any]]) -> bool:
+        """
+        Strip response_format from a request the provider rejected with a 400
+
+        Turns JSON mode off for this client, so later requests skip the
+        failing round trip. Returns True if the request should be resent.
+        """
+        if not kwargs or "response_format" not in kwargs or getattr(error, "status_code", None) != 400:
+            return False
+        self.logger.warning("Provider rejected response_format, retrying without JSON mode: %s", error)
+        del kwargs["response_format"]
+        self.json_mode = False
+        return True
+
+    def _parse_response(self, response) -> Dict[str, Any]:
+        """Convert an API response into the client's result dictionary"""
+        message = response.choices[0].message
+
+        result = {
+            "success": True,
+            "content": message.content,
+            "tool_calls": [],
+            "finish_reason": response.choices[0].finish_reason
+        }
+
+        # Parse tool calls if present
+        if hasattr(message, 'tool_calls') and message.tool_calls:
+            result["tool_calls"] = []
+            for tc in message.tool_calls:
+                parsed = self._parse_tool_call(tc.id, tc.type, tc.function.name, tc.function.arguments)
+                if parsed is not None:
+                    result["tool_calls"].append(parsed)
+
+        return result
+
+    def _parse_tool_call(
+            self,
+            call_id: str,
+            call_type: str,
+            name: str,
+            raw_arguments: str
+    ) -> Optional[Dict[str, Any]]:
+        """Build a tool call dictionary, or None if its arguments cannot be parsed"""
+        try:
+            # Try to parse arguments
+            try:
+                arguments = orjson.loads(raw_arguments) if orjson is not None else json.loads(raw_arguments)
+            except json.JSONDecodeError as e:
+                # If JSON parsing fails, try to fix common issues
+                self.logger.warning("JSON decode error for tool call: %s", e)
+                # Try to clean up the string
+                cleaned_args = raw_arguments.replace('\n', '\\n').replace('\r', '\\r')
+                try:
+                    arguments = json.loads(cleaned_args)
+                    raw_arguments = cleaned_args
+                except json.JSONDecodeError:
+                    # If still fails, log and skip this tool call
+                    if self.logger.isEnabledFor(logging.ERROR):
+                        self.logger.error("Failed to parse tool arguments, skipping: %s", raw_arguments[:100])
+                    return None
+
+            return {
+                "id": call_id,
+                "type": call_type,
+                "function": {
+                    "name": name,
+                    "arguments": arguments,
+                    # Valid JSON text of the arguments, for echoing back without re-encoding
+                    "arguments_raw": raw_arguments
+                }
+            }
+        except Exception as e:
+            self.logger.error("Error processing tool call: %s", e)
+            return None
+
+    def _collect_stream(self, stream) -> Dict[str, Any]:
+        """Accumulate a synchronous response stream into a result dictionary"""
+        accumulator = _StreamAccumulator()
+        raw_calls = []
+        for chunk in stream:
+            raw_calls.extend(accumulator.add(chunk))
+        raw_calls.extend(accumulator.finish())
+
+        tool_calls = [self._parse_tool_call(*raw) for raw in raw_calls]
+        return {
+            "success": True,
+            "content": accumulator.content,
+            "tool_calls": [tc for tc in tool_calls if tc is not None],
+            "finish_reason": accumulator.finish_reason
+        }
+
     def chat_completion(
             self,
             messages: List[Dict[str, str]],
             tools: Optional[List[Dict[str, Any]]] = None,
             temperature: float = 0.7,
             max_tokens: int = 4000,
-            tool_choice: str = "auto"
+            tool_choice: str = "auto",
+            prompt_cache_key: Optional[str] = None,
+            response_format: Optional[Dict[str, Any]] = None,
+            stream: bool = False
     ) -> Dict[str, Any]:
         """
         Call LLM API with chat completion
@@ -48,75 +569,150 @@ class LLMClient:
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
             tool_choice: Tool choice mode ("auto", "none", or specific tool)
+            prompt_cache_key: Stable key for provider-side prompt caching
+            response_format: Structured output mode, e.g. {"type": "json_object"}
+            stream: Receive the response incrementally instead of in one body
 
         Returns:
             Response dictionary
         """
-        try:
-            kwargs = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens
-            }
+        scope = self._cache_scope(temperature, tools, response_format, max_tokens, tool_choice)
+        if scope is not None:
+            cached = self._cached_response(scope, messages)
+            if cached is not None:
+                return cached
+
+        kwargs = None
+        while True:
+            try:
+                if kwargs is None:
+                    kwargs = self._build_request(
+                        messages, tools, temperature, max_tokens, tool_choice,
+                        prompt_cache_key, response_format
+                    )
+                if self._rate_limiter is not None:
+                    self._rate_limiter.wait()
+                if stream:
+                    result = self._collect_stream(self.client.chat.completions.create(stream=True, **kwargs))
+                else:
+                    result = self._parse_response(self.client.chat.completions.create(**kwargs))
+                if scope is not None:
+                    self._store_response(scope, messages, result)
+                return result
+
+            except Exception as e:
+                if not self._drop_rejected_json_mode(e, kwargs):
+                    return _error_result(e)
+
+    async def achat_completion(
+            self,
+            messages: List[Dict[str, str]],
+            tools: Optional[List[Dict[str, Any]]] = None,
+            temperature: float = 0.7,
+            max_tokens: int = 4000,
+            tool_choice: str = "auto",
+            prompt_cache_key: Optional[str] = None,
+            response_format: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Async variant of chat_completion
+
+        At most ``max_parallel`` requests are in flight at once per event loop,
+        started no faster than the client's requests-per-minute budget.
+        Temperature 0 responses are served from the client caches when set.
+        """
+        scope = self._cache_scope(temperature, tools, response_format, max_tokens, tool_choice)
+        if scope is not None:
+            cached = self._cached_response(scope, messages)
+            if cached is not None:
+                return cached
+
+        kwargs = None
+        while True:
+            try:
+                if kwargs is None:
+                    kwargs = self._build_request(
+                        messages, tools, temperature, max_tokens, tool_choice,
+                        prompt_cache_key, response_format
+                    )
+                client, semaphore = self._get_async_client()
+                async with semaphore:
+                    if self._rate_limiter is not None:
+                        await self._rate_limiter.acquire()
+                    response = await client.chat.completions.create(**kwargs)
+                result = self._parse_response(response)
+                if scope is not None:
+                    self._store_response(scope, messages, result)
+                return result
 
-            if tools:
-                kwargs["tools"] = tools
-                kwargs["tool_choice"] = tool_choice
+            except Exception as e:
+                if not self._drop_rejected_json_mode(e, kwargs):
+                    return _error_result(e)
 
-            response = self.client.chat.completions.create(**kwargs)
+    async def astream_chat_completion(
+            self,
+            messages: List[Dict[str, str]],
+            tools: Optional[List[Dict[str, Any]]] = None,
+            temperature: float = 0.7,
+            max_tokens: int = 4000,
+            tool_choice: str = "auto",
+            prompt_cache_key: Optional[str] = None,
+            response_format: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a chat completion, yielding tool calls as soon as they are complete
 
-            # Parse response
-            message = response.choices[0].message
+        Yields:
+            ("content", text) for each fragment of the reply text;
+            ("tool_call", tool_call) for each parsed tool call, in order, as
+            soon as the model moves past it; then ("done", response) with the
+            same shape chat_completion returns
+        """
+        accumulator = _StreamAccumulator()
+        tool_calls = []
+        kwargs = None
 
-            result = {
+        try:
+            kwargs = self._build_request(
+                messages, tools, temperature, max_tokens, tool_choice,
+                prompt_cache_key, response_format
+            )
+            client, semaphore = self._get_async_client()
+            async with semaphore:
+                if self._rate_limiter is not None:
+                    await self._rate_limiter.acquire()
+                try:
+                    stream = await client.chat.completions.create(stream=True, **kwargs)
+                except Exception as e:
+                    # Rejected before anything streamed, so it can be resent as is
+                    if not self._drop_rejected_json_mode(e, kwargs):
+                        raise
+                    stream = await client.chat.completions.create(stream=True, **kwargs)
+                async for chunk in stream:
+                    completed = accumulator.add(chunk)
+                    if accumulator.content_delta:
+                        yield "content", accumulator.content_delta
+                    for raw in completed:
+                        parsed = self._parse_tool_call(*raw)
+                        if parsed is not None:
+                            tool_calls.append(parsed)
+                            yield "tool_call", parsed
+
+            for raw in accumulator.finish():
+                parsed = self._parse_tool_call(*raw)
+                if parsed is not None:
+                    tool_calls.append(parsed)
+                    yield "tool_call", parsed
+
+            yield "done", {
                 "success": True,
-                "content": message.content,
-                "tool_calls": [],
-                "finish_reason": response.choices[0].finish_reason
+                "content": accumulator.content,
+                "tool_calls": tool_calls,
+                "finish_reason": accumulator.finish_reason
             }
 
-            # Parse tool calls if present
-            if hasattr(message, 'tool_calls') and message.tool_calls:
-                result["tool_calls"] = []
-                for tc in message.tool_calls:
-                    try:
-                        # Try to parse arguments
-                        try:
-                            arguments = json.loads(tc.function.arguments)
-                        except json.JSONDecodeError as e:
-                            # If JSON parsing fails, try to fix common issues
-                            self.logger.warning(f"JSON decode error for tool call: {str(e)}")
-                            # Try to clean up the string
-                            cleaned_args = tc.function.arguments.replace('\n', '\\n').replace('\r', '\\r')
-                            try:
-                                arguments = json.loads(cleaned_args)
-                            except:
-                                # If still fails, log and skip this tool call
-                                self.logger.error(f"Failed to parse tool arguments, skipping: {tc.function.arguments[:100]}")
-                                continue
-
-                        result["tool_calls"].append({
-                            "id": tc.id,
-                            "type": tc.type,
-                            "function": {
-                                "name": tc.function.name,
-                                "arguments": arguments
-                            }
-                        })
-                    except Exception as e:
-                        self.logger.error(f"Error processing tool call: {str(e)}")
-                        continue
-
-            return result
-
         except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "content": None,
-                "tool_calls": []
-            }
+            yield "done", _error_result(e, tool_calls)
 
     def retry_chat_completion(
             self,
@@ -125,6 +721,9 @@ class LLMClient:
             temperature: float = 0.7,
             max_tokens: int = 4000,
             tool_choice: str = "auto",
+            prompt_cache_key: Optional[str] = None,
+            response_format: Optional[Dict[str, Any]] = None,
+            stream: bool = False,
             max_retries: int = 3,
             retry_delay: float = 1.0
     ) -> Dict[str, Any]:
@@ -137,8 +736,11 @@ class LLMClient:
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
             tool_choice: Tool choice mode
+            prompt_cache_key: Stable key for provider-side prompt caching
+            response_format: Structured output mode, e.g. {"type": "json_object"}
+            stream: Receive each response incrementally instead of in one body
             max_retries: Maximum number of retries
-            retry_delay: Delay between retries in seconds
+            retry_delay: Base delay for exponential backoff in seconds
 
         Returns:
             Response dictionary
@@ -149,7 +751,47 @@ class LLMClient:
                 tools=tools,
                 temperature=temperature,
                 max_tokens=max_tokens,
-                tool_choice=tool_choice
+                tool_choice=tool_choice,
+                prompt_cache_key=prompt_cache_key,
+                response_format=response_format,
+                stream=stream
+            )
+
+            if result["success"]:
+                return result
+
+            # If not successful and not the last attempt, wait and retry
+            if attempt < max_retries - 1:
+                delay = _backoff_delay(result, attempt, retry_delay)
+                if delay is None:
+                    break
+                time.sleep(delay)
+
+        # If all retries failed, return the last result
+        return result
+
+    async def aretry_chat_completion(
+            self,
+            messages: List[Dict[str, str]],
+            tools: Optional[List[Dict[str, Any]]] = None,
+            temperature: float = 0.7,
+            max_tokens: int = 4000,
+            tool_choice: str = "auto",
+            prompt_cache_key: Optional[str] = None,
+            response_format: Optional[Dict[str, Any]] = None,
+            max_retries: int = 3,
+            retry_delay: float = 1.0
+    ) -> Dict[str, Any]:
+        """Async variant of retry_chat_completion"""
+        for attempt in range(max_retries):
+            result = await self.achat_completion(
+                messages=messages,
+                tools=tools,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                tool_choice=tool_choice,
+                prompt_cache_key=prompt_cache_key,
+                response_format=response_format
             )
 
             if result["success"]:
@@ -157,7 +799,10 @@ class LLMClient:
 
             # If not successful and not the last attempt, wait and retry
             if attempt < max_retries - 1:
-                time.sleep(retry_delay * (attempt + 1))
+                delay = _backoff_delay(result, attempt, retry_delay)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
 
         # If all retries failed, return the last result
         return result
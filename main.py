@@ -5,32 +5,173 @@ Main entry point for the Multi-Agent Code Generation System
 import os
 import sys
 import json
+import queue
+import time
+import atexit
+import asyncio
+import threading
 import logging
+import logging.handlers
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 import argparse
 
 from colorama import init, Fore, Style
-from tqdm import tqdm
 
-from config import LOG_DIR, LOG_FILE, OUTPUT_DIR, DEFAULT_PROVIDER
-from llm_client import LLMClient
-from tools import ToolManager
-from orchestrator import MultiAgentOrchestrator
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard library encoder
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:
+    # Fall back to the default asyncio event loop
+    uvloop = None
+
+from config import (
+    LOG_DIR, LOG_FILE, OUTPUT_DIR, DEFAULT_PROVIDER, LLM_CACHE_PATH, LLM_MAX_CONCURRENCY, LLM_RPM,
+    PLAN_CACHE_PATH
+)
 
 # Initialize colorama for colored console output
 init(autoreset=True)
 
 
+# Default task: arXiv CS Daily webpage
+DEFAULT_TASK = """  
+Build an 'arXiv CS Daily' webpage - a pure frontend web application that uses the arXiv API (https://export.arxiv.org/api/query) to track daily computer science preprints. 
+
+REQUIREMENTS: 
+1. Domain-Specific Navigation System: Create categorized navigation tabs based on arXiv CS fields including: cs.AI (Artificial Intelligence), cs.CL (Computation and Language), cs.CV (Computer Vision), cs.LG (Machine Learning), cs.NE (Neural Computing), cs.RO (Robotics), cs.SE (Software Engineering), cs.SY (Systems and Control), cs.CR (Cryptography), cs.DB (Databases), cs.DC (Distributed Computing), cs.HC (Human-Computer Interaction), cs.TH (Theory of Computation). Allow users to filter and switch between CS subfields. Include an 'All' tab to show papers from all CS categories. Highlight the currently active category with visual indicator. 
+
+2. Daily Updated Paper List: Fetch papers from arXiv API using URL format: https://export.arxiv.org/api/query?search_query=cat:cs.AI&start=0&max_results=20&sortBy=submittedDate&sortOrder=descending proxied by local flask. Display latest papers with: paper title (clickable to open detail view), submission date/time, arXiv field tag (e.g., [cs.CV]), and primary author name. Show loading spinner while fetching data. Handle API errors gracefully with user-friendly error messages. Implement pagination with 'Load More' button. Each paper card should have hover effects. 
+
+3. Dedicated Paper Detail Page: Show as modal or SPA-style view when clicking a paper title (no page reload). Display: full title, all authors, complete abstract, submission date, arXiv ID. Provide direct PDF link button (https://arxiv.org/pdf/ID.pdf). Provide link to arXiv abstract page (https://arxiv.org/abs/ID). Citation generation tools with one-click copy functionality: BibTeX format and APA-style citation. Back button to return to paper list. 
+
+DESIGN: Clean, modern, academic-style interface. 
+
+TECHNICAL: 
+1. Frontend: HTML5, CSS3, vanilla JavaScript (NO frameworks). Parse XML response from arXiv API using DOMParser. Store user preferences in localStorage. 
+2. Backend: One single file Python Flask backend to reroute requests directly to export.arxiv.org
+
+**IMPORTANT**: NO DEMONSTRATION, the code must be production ready.
+  
+"""
+
+
+def dumps_line(data) -> bytes:
+    """Encode data as one JSON Lines record"""
+    if orjson is not None:
+        return orjson.dumps(data, default=str) + b"\n"
+    return json.dumps(data, ensure_ascii=False, default=str).encode('utf-8') + b"\n"
+
+
+def write_json(path: str, data) -> None:
+    """Write data as indented JSON in a single call, using orjson when available"""
+    if orjson is not None:
+        Path(path).write_bytes(
+            orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str)
+        )
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, default=str)
+
+
+# Plain progress line: precomputed bar segments sliced per update
+BAR_WIDTH = 50
+BAR_FILL = "█" * BAR_WIDTH
+BAR_EMPTY = " " * BAR_WIDTH
+
+# Colored label that starts each status line, by orchestrator status
+STATUS_PREFIXES = {
+    "planning": f"\n{Fore.CYAN}📋 PLANNING: ",
+    "coding": f"\n{Fore.GREEN}💻 CODING: ",
+    "evaluating": f"\n{Fore.YELLOW}🔍 EVALUATING: ",
+    "debugging": f"\n{Fore.MAGENTA}🐛 DEBUGGING: ",
+    "completed": f"\n{Fore.GREEN}✅ COMPLETED: "
+}
+DEFAULT_STATUS_PREFIX = f"\n{Fore.WHITE}"
+
+
 class ProgressTracker:
     """Tracks and displays progress of the multi-agent system"""
 
-    def __init__(self):
+    # Status lines arriving within this window (seconds) are written together
+    FLUSH_WINDOW = 0.005
+    FLUSH_BATCH = 8
+    # Progress records are flushed to the JSONL log in groups of this size or age (seconds)
+    JOURNAL_BATCH = 32
+    JOURNAL_WINDOW = 0.1
+
+    def __init__(self, journal_path: Optional[str] = None, fancy: bool = False):
+        # fancy: draw tqdm progress bars instead of the plain progress line
+        self.fancy = fancy
         self.current_phase = None
         self.progress_bar = None
         self.log_entries = []
 
+        # Record of every update in this run, so an interrupted run keeps its progress;
+        # truncated on open so the file never grows across runs
+        self._journal = open(journal_path, "wb", buffering=64 * 1024) if journal_path else None
+        self._journal_unflushed = 0
+        self._journal_last_flush = time.monotonic()
+
+        self._pending = []
+        self._last_flush = 0.0
+        self._flush_timer = None
+        self._lock = threading.Lock()
+        # (monotonic ~1 ms bucket, ISO wall-clock time) shared by updates in the same bucket
+        self._ts_cache = (0, "")
+
+    def _timestamp(self) -> str:
+        """ISO 8601 wall-clock time of an update, read and formatted at most once per millisecond"""
+        bucket = time.monotonic_ns() >> 20
+        cached_bucket, stamp = self._ts_cache
+        if bucket != cached_bucket:
+            stamp = datetime.now().isoformat()
+            self._ts_cache = (bucket, stamp)
+        return stamp
+
+    def _emit(self, line: str):
+        """Queue a status line, writing the batch once it is full or the window has passed"""
+        with self._lock:
+            self._pending.append(line)
+            if len(self._pending) >= self.FLUSH_BATCH or time.monotonic() - self._last_flush > self.FLUSH_WINDOW:
+                self._flush_locked()
+            elif self._flush_timer is None:
+                # Make sure the tail of a burst is not held back
+                self._flush_timer = threading.Timer(self.FLUSH_WINDOW, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _flush_locked(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self._pending:
+            sys.stdout.write("".join(self._pending))
+            sys.stdout.flush()
+            self._pending.clear()
+        self._last_flush = time.monotonic()
+
+    def _write_journal(self, entry: dict):
+        with self._lock:
+            self._journal.write(dumps_line(entry))
+            self._journal_unflushed += 1
+            now = time.monotonic()
+            if self._journal_unflushed >= self.JOURNAL_BATCH or now - self._journal_last_flush > self.JOURNAL_WINDOW:
+                self._journal.flush()
+                self._journal_unflushed = 0
+                self._journal_last_flush = now
+
+    def flush(self):
+        """Write any pending status lines"""
+        with self._lock:
+            self._flush_locked()
+
     def update(self, progress_data: dict):
         """Update progress based on orchestrator callback"""
         message = progress_data.get("message", "")
@@ -39,48 +180,57 @@ class ProgressTracker:
         total = progress_data.get("total", 0)
 
         # Log the message
-        self.log_entries.append({
-            "timestamp": datetime.now().isoformat(),
+        entry = {
+            "timestamp": self._timestamp(),
             "status": status,
             "message": message
-        })
+        }
+        self.log_entries.append(entry)
+        if self._journal is not None:
+            self._write_journal(entry)
 
         # Print colored status
-        if status == "planning":
-            print(f"\n{Fore.CYAN}📋 PLANNING: {message}{Style.RESET_ALL}")
-        elif status == "coding":
-            print(f"\n{Fore.GREEN}💻 CODING: {message}{Style.RESET_ALL}")
-        elif status == "evaluating":
-            print(f"\n{Fore.YELLOW}🔍 EVALUATING: {message}{Style.RESET_ALL}")
-        elif status == "debugging":
-            print(f"\n{Fore.MAGENTA}🐛 DEBUGGING: {message}{Style.RESET_ALL}")
-        elif status == "completed":
-            print(f"\n{Fore.GREEN}✅ COMPLETED: {message}{Style.RESET_ALL}")
-        else:
-            print(f"\n{Fore.WHITE}{message}{Style.RESET_ALL}")
+        prefix = STATUS_PREFIXES.get(status, DEFAULT_STATUS_PREFIX)
+        self._emit(f"{prefix}{message}{Style.RESET_ALL}\n")
 
         # Update progress bar if we have total
-        if total > 0:
+        if total > 0 and not self.fancy:
+            # Redraw a plain progress line in place; status lines start on a new line
+            filled = min(current, total) * BAR_WIDTH // total
+            self._emit(
+                f"\r{Fore.CYAN}{status.upper():10s} {current:>5}/{total} "
+                f"|{BAR_FILL[:filled]}{BAR_EMPTY[filled:]}|{Style.RESET_ALL}"
+            )
+            self.current_phase = status
+        elif total > 0:
             if self.progress_bar is None or self.current_phase != status:
                 if self.progress_bar:
                     self.progress_bar.close()
-                self.progress_bar = tqdm(total=total, desc=status.upper())
+                from tqdm import tqdm
+                # mininterval throttles redraws when updates arrive in bursts
+                self.progress_bar = tqdm(total=total, desc=status.upper(), mininterval=0.2)
                 self.current_phase = status
 
             if self.progress_bar:
-                self.progress_bar.n = current
-                self.progress_bar.refresh()
+                self.progress_bar.update(current - self.progress_bar.n)
 
     def close(self):
-        """Close progress bar"""
+        """Flush pending output and close progress bar and progress journal"""
+        if not self.fancy and self.current_phase is not None:
+            # Leave the plain progress line
+            self._emit("\n")
+        self.flush()
         if self.progress_bar:
             self.progress_bar.close()
+        if self._journal is not None:
+            with self._lock:
+                self._journal.close()
+                self._journal = None
 
     def save_log(self, log_file: str):
         """Save log entries to file"""
         try:
-            with open(log_file, 'w', encoding='utf-8') as f:
-                json.dump(self.log_entries, f, indent=2)
+            write_json(log_file, self.log_entries)
             print(f"{Fore.BLUE}📝 Log saved to: {log_file}{Style.RESET_ALL}")
         except Exception as e:
             print(f"{Fore.RED}❌ Failed to save log: {str(e)}{Style.RESET_ALL}")
@@ -93,15 +243,26 @@ def setup_logging(log_dir: str = LOG_DIR, log_file: str = LOG_FILE):
 
     log_path = Path(log_dir) / log_file
 
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_path, encoding='utf-8'),
-            logging.StreamHandler(sys.stdout)
-        ]
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler(log_path, encoding='utf-8')
+    stream_handler = logging.StreamHandler(sys.stdout)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    # Write records from a background thread so logging calls never block on I/O
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True
     )
+    listener.start()
+    atexit.register(listener.stop)
+
+    # The queue handler only merges args into the message; the listener's handlers add the layout
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+
+    # Configure logging
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
 
     return str(log_path)
 
@@ -194,9 +355,72 @@ def main():
         action="store_true",
         help="Skip code evaluation phase for faster execution"
     )
+    parser.add_argument(
+        "--no-llm-debug",
+        action="store_true",
+        help="Only apply deterministic fixes (CORS setup, request timeouts) in the debugging phase"
+    )
+    parser.add_argument(
+        "--stream-plan",
+        action="store_true",
+        help="Start generating code for each task while the rest of the plan is still streaming"
+    )
+    parser.add_argument(
+        "--fuse-small-plans",
+        action="store_true",
+        help="Plan and generate code in one conversation when the plan has at most 3 tasks"
+    )
+    parser.add_argument(
+        "--self-review",
+        action="store_true",
+        help="Let the coding agent review its own code for tasks with at most 3 files instead of a separate evaluation"
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=LLM_MAX_CONCURRENCY,
+        help=f"Maximum concurrent LLM requests and parallel coding tasks (default: {LLM_MAX_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        default=LLM_RPM,
+        help="Maximum LLM requests started per minute, 0 for no limit (default: LLM_RPM or 0)"
+    )
+    parser.add_argument(
+        "--fancy-progress",
+        action="store_true",
+        help="Draw tqdm progress bars instead of the plain progress line"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always call the LLM instead of reusing cached deterministic responses and plans"
+    )
+    parser.add_argument(
+        "--fuzzy-cache",
+        action="store_true",
+        help="Also reuse cached LLM responses for prompts that differ only in case, whitespace or wording"
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=3600,
+        help="Seconds a cached LLM response or plan stays valid (default: 3600)"
+    )
 
     args = parser.parse_args()
 
+    # Deferred so --help and argument errors return without loading the agent stack
+    from llm_client import LLMClient
+    from llm_cache import SemanticCache, DiskCache, PlanCache
+    from tools import ToolManager
+    from orchestrator import MultiAgentOrchestrator
+
+    # Agents run their LLM I/O on asyncio; prefer the libuv-based loop when available
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
     # Print banner
     print_banner()
 
@@ -209,28 +433,7 @@ def main():
     Path(output_dir).mkdir(parents=True, exist_ok=True)
 
     # Default task: arXiv CS Daily webpage
-    if not args.task:
-        task_description = """  
-Build an 'arXiv CS Daily' webpage - a pure frontend web application that uses the arXiv API (https://export.arxiv.org/api/query) to track daily computer science preprints. 
-
-REQUIREMENTS: 
-1. Domain-Specific Navigation System: Create categorized navigation tabs based on arXiv CS fields including: cs.AI (Artificial Intelligence), cs.CL (Computation and Language), cs.CV (Computer Vision), cs.LG (Machine Learning), cs.NE (Neural Computing), cs.RO (Robotics), cs.SE (Software Engineering), cs.SY (Systems and Control), cs.CR (Cryptography), cs.DB (Databases), cs.DC (Distributed Computing), cs.HC (Human-Computer Interaction), cs.TH (Theory of Computation). Allow users to filter and switch between CS subfields. Include an 'All' tab to show papers from all CS categories. Highlight the currently active category with visual indicator. 
-
-2. Daily Updated Paper List: Fetch papers from arXiv API using URL format: https://export.arxiv.org/api/query?search_query=cat:cs.AI&start=0&max_results=20&sortBy=submittedDate&sortOrder=descending proxied by local flask. Display latest papers with: paper title (clickable to open detail view), submission date/time, arXiv field tag (e.g., [cs.CV]), and primary author name. Show loading spinner while fetching data. Handle API errors gracefully with user-friendly error messages. Implement pagination with 'Load More' button. Each paper card should have hover effects. 
-
-3. Dedicated Paper Detail Page: Show as modal or SPA-style view when clicking a paper title (no page reload). Display: full title, all authors, complete abstract, submission date, arXiv ID. Provide direct PDF link button (https://arxiv.org/pdf/ID.pdf). Provide link to arXiv abstract page (https://arxiv.org/abs/ID). Citation generation tools with one-click copy functionality: BibTeX format and APA-style citation. Back button to return to paper list. 
-
-DESIGN: Clean, modern, academic-style interface. 
-
-TECHNICAL: 
-1. Frontend: HTML5, CSS3, vanilla JavaScript (NO frameworks). Parse XML response from arXiv API using DOMParser. Store user preferences in localStorage. 
-2. Backend: One single file Python Flask backend to reroute requests directly to export.arxiv.org
-
-**IMPORTANT**: NO DEMONSTRATION, the code must be production ready.
-  
-"""
-    else:
-        task_description = args.task
+    task_description = args.task or DEFAULT_TASK
 
     print(f"{Fore.CYAN}📋 Task Description:{Style.RESET_ALL}")
     print(f"{Fore.WHITE}{task_description[:200]}...{Style.RESET_ALL}\n")
@@ -239,12 +442,27 @@ TECHNICAL:
     print(f"{Fore.YELLOW}🔧 Initializing system components...{Style.RESET_ALL}")
 
     try:
-        llm_client = LLMClient(provider=args.provider)
+        use_disk_cache = LLM_CACHE_PATH and not args.no_cache
+        use_plan_cache = PLAN_CACHE_PATH and not args.no_cache
+        llm_client = LLMClient(
+            provider=args.provider,
+            max_parallel=args.max_concurrency,
+            rpm=args.rpm,
+            cache=None if args.no_cache else SemanticCache(ttl=args.cache_ttl, exact_only=not args.fuzzy_cache),
+            disk_cache=DiskCache(LLM_CACHE_PATH, ttl=args.cache_ttl) if use_disk_cache else None
+        )
         tool_manager = ToolManager(base_dir=output_dir)
         orchestrator = MultiAgentOrchestrator(
             llm_client=llm_client,
             tool_manager=tool_manager,
-            max_iterations=3 if not args.no_evaluation else 1
+            max_iterations=3 if not args.no_evaluation else 1,
+            max_parallel_tasks=args.max_concurrency,
+            fuse_small_plans=args.fuse_small_plans,
+            llm_debugging=not args.no_llm_debug,
+            stream_planning=args.stream_plan,
+            use_response_cache=not args.no_cache,
+            self_review=args.self_review,
+            plan_cache=PlanCache(PLAN_CACHE_PATH, ttl=args.cache_ttl) if use_plan_cache else None
         )
 
         print(f"{Fore.GREEN}✅ System initialized successfully{Style.RESET_ALL}\n")
@@ -254,27 +472,40 @@ TECHNICAL:
         return 1
 
     # Create progress tracker
-    progress_tracker = ProgressTracker()
+    progress_tracker = ProgressTracker(
+        journal_path=str(Path(LOG_DIR) / "progress.jsonl"),
+        fancy=args.fancy_progress
+    )
 
     # Execute task
     print(f"{Fore.CYAN}🚀 Starting execution...{Style.RESET_ALL}\n")
 
+    async def run():
+        # main owns the client, so it closes the connections before the loop ends
+        async with llm_client:
+            return await orchestrator.aexecute(
+                task_description=task_description,
+                callback=progress_tracker.update
+            )
+
     try:
-        result = orchestrator.execute(
-            task_description=task_description,
-            callback=progress_tracker.update
-        )
+        result = asyncio.run(run())
 
         progress_tracker.close()
 
+        progress_tracker.log_entries.append({
+            "timestamp": datetime.now().isoformat(),
+            "status": "cache",
+            "message": f"LLM cache hits: {llm_client.cache_hits}, misses: {llm_client.cache_misses}"
+        })
+
         # Save execution log
         log_file = Path(output_dir) / "execution_log.json"
         progress_tracker.save_log(str(log_file))
 
         # Save result
         result_file = Path(output_dir) / "result.json"
-        with open(result_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, default=str)
+        write_json(str(result_file), result)
 
         print(f"{Fore.BLUE}📊 Result saved to: {result_file}{Style.RESET_ALL}")
 
@@ -4,61 +4,135 @@ Coordinates the execution of multiple agents to complete software projects
 """
 
 import json
+import queue
+import asyncio
 import logging
+import threading
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-from agents import ProjectPlanningAgent, CodeGenerationAgent, CodeEvaluationAgent
-from debugger_agent import CodeDebuggerAgent
-from llm_client import LLMClient
+from agents import ProjectPlanningAgent, CodeGenerationAgent, CodeEvaluationAgent, MultiStageAgent
+from deterministic_fixers import apply_fixers
+from llm_client import LLMClient, count_tokens
+from llm_cache import SemanticCache, PlanCache
 from tools import ToolManager
 
 
-class MultiAgentOrchestrator:
-    """Orchestrates multiple agents to complete software development tasks"""
+async def _cancel_runs(runs: List["asyncio.Future[Any]"]):
+    """Cancel unfinished runs and wait until every one has stopped"""
+    for run in runs:
+        run.cancel()
+    await asyncio.gather(*runs, return_exceptions=True)
 
-    def __init__(
-            self,
-            llm_client: LLMClient,
-            tool_manager: ToolManager,
-            max_iterations: int = 3
-    ):
-        self.llm_client = llm_client
-        self.tool_manager = tool_manager
-        self.max_iterations = max_iterations
-        self.logger = logging.getLogger("Orchestrator")
 
-        # Initialize agents
-        self.planning_agent = ProjectPlanningAgent(
+def _build_agents(
+        llm_client: LLMClient,
+        tool_manager: ToolManager,
+        fuse_small_plans: bool,
+        use_response_cache: bool
+) -> Dict[str, Any]:
+    """Construct the agent set an orchestrator works with"""
+    # Exact repeats only: a near-identical prompt may differ in code that matters
+    response_cache = SemanticCache(exact_only=True) if use_response_cache else None
+
+    return {
+        "response_cache": response_cache,
+        "planning": ProjectPlanningAgent(
             name="ProjectPlanningAgent",
             llm_client=llm_client,
             tool_manager=tool_manager,
-            temperature=0.7,
-            max_tokens=4000
-        )
-
-        self.coding_agent = CodeGenerationAgent(
+            temperature=0,
+            max_tokens=4000,
+            cache=response_cache
+        ),
+        "coding": CodeGenerationAgent(
             name="CodeGenerationAgent",
             llm_client=llm_client,
             tool_manager=tool_manager,
             temperature=0.3,
-            max_tokens=4000
-        )
-
-        self.evaluation_agent = CodeEvaluationAgent(
+            max_tokens=4000,
+            cache=response_cache
+        ),
+        "evaluation": CodeEvaluationAgent(
             name="CodeEvaluationAgent",
             llm_client=llm_client,
             tool_manager=tool_manager,
-            temperature=0.5,
-            max_tokens=3000
-        )
-
-        self.debugger_agent = CodeDebuggerAgent(
-            name="CodeDebuggerAgent",
+            temperature=0,
+            max_tokens=3000,
+            cache=response_cache
+        ),
+        "multi_stage": MultiStageAgent(
+            name="MultiStageAgent",
             llm_client=llm_client,
             tool_manager=tool_manager,
             temperature=0.3,
-            max_tokens=4000
-        )
+            max_tokens=4000,
+            cache=response_cache
+        ) if fuse_small_plans else None,
+        # Built on first use by MultiAgentOrchestrator.debugger_agent
+        "debugger": None
+    }
+
+
+def __getattr__(name: str):
+    # The debugger module is imported only when something asks for it
+    if name == "CodeDebuggerAgent":
+        from debugger_agent import CodeDebuggerAgent
+        return CodeDebuggerAgent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class MultiAgentOrchestrator:
+    """Orchestrates multiple agents to complete software development tasks"""
+
+    # With self_review, tasks creating at most this many files review their own
+    # code while generating it instead of taking a separate evaluation request
+    SELF_REVIEW_MAX_FILES = 3
+
+    # Undelivered progress updates kept while a callback is slow; the oldest are dropped
+    PROGRESS_QUEUE_SIZE = 64
+
+    def __init__(
+            self,
+            llm_client: LLMClient,
+            tool_manager: ToolManager,
+            max_iterations: int = 3,
+            max_parallel_tasks: int = 4,
+            fuse_small_plans: bool = False,
+            plan_cache: Optional[PlanCache] = None,
+            llm_debugging: bool = True,
+            stream_planning: bool = False,
+            use_response_cache: bool = False,
+            self_review: bool = False
+    ):
+        self.llm_client = llm_client
+        self.tool_manager = tool_manager
+        self.max_iterations = max_iterations
+        self.max_parallel_tasks = max_parallel_tasks
+        # When False, debugging relies on the deterministic fixers alone
+        self.llm_debugging = llm_debugging
+        # Start coding each task as soon as the streamed plan contains it
+        self.stream_planning = stream_planning
+        # Let the coding agent grade small tasks itself; tasks without a parsed
+        # review still go to the evaluation agent
+        self.self_review = self_review
+        self.logger = logging.getLogger("Orchestrator")
+
+        # Progress updates waiting for the dispatch thread during a run
+        self._progress_queue: Optional[queue.Queue] = None
+
+        # Plans for previously seen (or near-identical) task descriptions
+        self.plan_cache = plan_cache
+
+        # Agents are built once per orchestrator; reset() readies them for the next execute()
+        self._agents = _build_agents(llm_client, tool_manager, fuse_small_plans, use_response_cache)
+        self._debugger_lock = threading.Lock()
+        # Optional shared cache so exact repeats of deterministic prompts skip the LLM round-trip
+        self.response_cache = self._agents["response_cache"]
+        self.planning_agent = self._agents["planning"]
+        self.coding_agent = self._agents["coding"]
+        self.evaluation_agent = self._agents["evaluation"]
+        # Plans and codes small projects in a single conversation
+        self.multi_stage_agent = self._agents["multi_stage"]
 
         # State management
         self.state = {
@@ -69,14 +143,40 @@ class MultiAgentOrchestrator:
             "tasks_pending": [],
             "all_created_files": [],
             "evaluations": [],
+            "self_evaluations": {},
+            "evaluations_needing_rework": 0,
             "iterations": 0,
             "start_time": None,
             "end_time": None
         }
 
+    @property
+    def debugger_agent(self):
+        """Debugger agent, imported and constructed the first time debugging runs"""
+        with self._debugger_lock:
+            if self._agents["debugger"] is None:
+                from debugger_agent import CodeDebuggerAgent
+                self._agents["debugger"] = CodeDebuggerAgent(
+                    name="CodeDebuggerAgent",
+                    llm_client=self.llm_client,
+                    tool_manager=self.tool_manager,
+                    temperature=0.3,
+                    max_tokens=4000
+                )
+            return self._agents["debugger"]
+
     def execute(self, task_description: str, callback=None) -> Dict[str, Any]:
+        """Execute a complete software development task, blocking until aexecute completes"""
+        async def run():
+            # The loop is ours alone, so its LLM connections can be closed with it
+            async with self.llm_client:
+                return await self.aexecute(task_description, callback)
+
+        return asyncio.run(run())
+
+    async def aexecute(self, task_description: str, callback=None) -> Dict[str, Any]:
         """
-        Execute a complete software development task
+        Execute a complete software development task asynchronously
 
         Args:
             task_description: Natural language description of the task
@@ -91,11 +191,18 @@ class MultiAgentOrchestrator:
 
         self.state["start_time"] = datetime.now()
         self.state["status"] = "planning"
+        # Files may have changed outside the tools since the last run
+        self.tool_manager.clear_cache()
+        progress_thread = self._start_progress_dispatch(callback)
 
         try:
             # Step 1: Planning Phase
             self._update_progress("Planning project architecture...", callback)
-            planning_result = self._execute_planning(task_description)
+            coding_results = None
+            if self.stream_planning and self.multi_stage_agent is None:
+                planning_result, coding_results = await self._execute_pipelined(task_description, callback)
+            else:
+                planning_result = await self._execute_planning(task_description)
 
             if not planning_result["success"]:
                 self.state["status"] = "failed"
@@ -104,19 +211,35 @@ class MultiAgentOrchestrator:
             self.state["plan"] = planning_result["plan"]
             self.state["tasks_pending"] = planning_result["plan"].get("tasks", [])
 
-            self.logger.info(f"Plan created with {len(self.state['tasks_pending'])} tasks")
+            self.logger.info("Plan created with %s tasks", len(self.state['tasks_pending']))
 
             # Step 2: Code Generation Phase
             self.state["status"] = "coding"
-            coding_results = self._execute_coding(callback)
+            if coding_results is not None:
+                # Tasks were coded while the plan streamed in
+                coding_results = self._record_coding_results(*coding_results)
+            elif planning_result.get("fused"):
+                # Small plan: the planning conversation already generated the code
+                coding_results = self._record_fused_coding(planning_result)
+            else:
+                coding_results = await self._execute_coding(callback)
+
+            # Deterministic fixes are written right away, so apply them before
+            # evaluation starts reading the files
+            loop = asyncio.get_running_loop()
+            patched_files = await loop.run_in_executor(None, self._apply_fixers, callback)
 
             # Step 3: Evaluation Phase (optional - can be skipped for speed)
             self.state["status"] = "evaluating"
-            self._execute_evaluation(callback)
+            await self._execute_evaluation(callback)
 
             # Step 3.5: Debug and Fix Phase (NEW!)
+            # Runs after evaluation, which must not see files rewritten mid-review.
+            # The debugger is synchronous; keep it off the event loop
             self.state["status"] = "debugging"
-            self._execute_debugging(callback, task_description)
+            await loop.run_in_executor(
+                None, self._execute_debugging, callback, task_description, patched_files
+            )
 
             # Step 4: Check if we need to iterate
             should_iterate = self._should_iterate()
@@ -136,15 +259,42 @@ class MultiAgentOrchestrator:
             return self._build_result(success=True)
 
         except Exception as e:
-            self.logger.error(f"Orchestrator error: {str(e)}", exc_info=True)
+            self.logger.error("Orchestrator error: %s", e, exc_info=True)
             self.state["status"] = "failed"
             return self._build_result(success=False, error=str(e))
 
-    def _execute_planning(self, task_description: str) -> Dict[str, Any]:
+        finally:
+            if progress_thread is not None:
+                # Deliver what is still queued before returning
+                self._progress_queue.put(None)
+                progress_thread.join()
+                self._progress_queue = None
+
+    def _plan_scope(self) -> str:
+        """Plan cache scope: plans are only reused for the model that wrote them"""
+        return f"{self.llm_client.provider}|{self.llm_client.model}"
+
+    def _cached_plan(self, task_description: str) -> Optional[Dict[str, Any]]:
+        if self.plan_cache is None:
+            return None
+        return self.plan_cache.lookup(task_description, scope=self._plan_scope())
+
+    async def _execute_planning(self, task_description: str) -> Dict[str, Any]:
         """Execute planning phase"""
         self.logger.info("Phase 1: Project Planning")
 
-        result = self.planning_agent.execute(task_description)
+        if self.multi_stage_agent is not None:
+            # Fused planning also writes code, so there is nothing to reuse
+            result = await self.multi_stage_agent.aexecute(task_description)
+        else:
+            plan = self._cached_plan(task_description)
+            if plan is not None:
+                self.logger.info("Reusing cached plan with %s tasks", len(plan["tasks"]))
+                return {"success": True, "plan": plan}
+
+            result = await self.planning_agent.aexecute(task_description)
+            if result["success"] and self.plan_cache is not None:
+                self.plan_cache.store(task_description, result["plan"], scope=self._plan_scope())
 
         if result["success"]:
             self.logger.info("Planning completed successfully")
@@ -153,34 +303,31 @@ class MultiAgentOrchestrator:
 
         return result
 
-    def _execute_coding(self, callback=None) -> Dict[str, Any]:
+    async def _execute_coding(self, callback=None) -> Dict[str, Any]:
         """Execute coding phase for all tasks"""
         self.logger.info("Phase 2: Code Generation")
 
-        results = []
-        total_tasks = len(self.state["tasks_pending"])
-
-        for idx, task in enumerate(self.state["tasks_pending"]):
-            task_id = task.get("task_id", f"T{idx+1}")
-            task_title = task.get("title", "Untitled")
-
-            progress_msg = f"Generating code for task {idx+1}/{total_tasks}: {task_title}"
-            self._update_progress(progress_msg, callback, idx+1, total_tasks)
-
-            self.logger.info(f"Executing task: {task_id} - {task_title}")
-            self.state["current_task"] = task_id
+        results = await self.execute_plan_parallel(self.state["plan"], callback)
+        task_ids = [task.get("task_id", f"T{idx+1}") for idx, task in enumerate(self.state["tasks_pending"])]
+        return self._record_coding_results(results, task_ids)
 
-            # Execute code generation
-            result = self.coding_agent.execute(task, context=self.state["plan"])
+    def _record_coding_results(self, results: List[Dict[str, Any]], task_ids: List[str]) -> Dict[str, Any]:
+        """Record per-task code generation results; task_ids names the task each result is for"""
+        planned = {task.get("task_id", f"T{idx+1}") for idx, task in enumerate(self.state["tasks_pending"])}
 
+        for task_id, result in zip(task_ids, results):
             if result["success"]:
-                self.logger.info(f"Task {task_id} completed: {len(result['created_files'])} files created")
-                self.state["tasks_completed"].append(task_id)
+                self.logger.info("Task %s completed: %s files created", task_id, len(result['created_files']))
+                # The files exist either way, so later phases must still see them
                 self.state["all_created_files"].extend(result["created_files"])
+                if task_id not in planned:
+                    self.logger.warning("Task %s was coded from the streamed plan but is not in the final plan", task_id)
+                    continue
+                self.state["tasks_completed"].append(task_id)
+                if result.get("evaluation"):
+                    self.state["self_evaluations"][task_id] = result["evaluation"]
             else:
-                self.logger.error(f"Task {task_id} failed: {result.get('error')}")
-
-            results.append(result)
+                self.logger.error("Task %s failed: %s", task_id, result.get('error'))
 
         return {
             "success": True,
@@ -188,7 +335,202 @@ class MultiAgentOrchestrator:
             "total_files": len(self.state["all_created_files"])
         }
 
-    def _execute_evaluation(self, callback=None) -> Dict[str, Any]:
+    def _record_fused_coding(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Record code generated during fused planning as the coding phase"""
+        self.logger.info("Phase 2: Code Generation (fused with planning)")
+
+        if result["success"]:
+            for idx, task in enumerate(self.state["tasks_pending"]):
+                self.state["tasks_completed"].append(task.get("task_id", f"T{idx+1}"))
+            self.state["all_created_files"].extend(result["created_files"])
+        else:
+            self.logger.error("Fused code generation failed: %s", result.get('error'))
+
+        return {
+            "success": True,
+            "results": [result],
+            "total_files": len(self.state["all_created_files"])
+        }
+
+    @staticmethod
+    def _plan_waves(tasks: List[Dict[str, Any]]) -> List[List[int]]:
+        """
+        Group task indices into dependency layers (topological order)
+
+        Every task in a layer depends only on tasks from earlier layers.
+        Unknown dependency IDs are ignored; tasks caught in a cycle are
+        placed together in a final layer.
+        """
+        ids = [task.get("task_id", f"T{idx+1}") for idx, task in enumerate(tasks)]
+        index_of = {task_id: idx for idx, task_id in enumerate(ids)}
+
+        remaining = {
+            idx: {index_of[dep] for dep in (task.get("dependencies") or []) if dep in index_of} - {idx}
+            for idx, task in enumerate(tasks)
+        }
+
+        waves = []
+        while remaining:
+            ready = sorted(idx for idx, deps in remaining.items() if not deps)
+            if not ready:
+                # Dependency cycle - run the rest together rather than stall
+                waves.append(sorted(remaining))
+                break
+
+            waves.append(ready)
+            for idx in ready:
+                del remaining[idx]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+        return waves
+
+    async def execute_plan_parallel(self, plan: Dict[str, Any], callback=None) -> List[Dict[str, Any]]:
+        """
+        Generate code for every task in a plan, concurrently where dependencies allow
+
+        Each task starts as soon as the tasks it depends on have finished
+        (bounded by max_parallel_tasks), rather than waiting for its whole
+        dependency layer; downstream tasks receive the files created by
+        their dependencies in their context.
+
+        Returns:
+            Code generation results, in the plan's task order
+        """
+        tasks = plan.get("tasks", [])
+        total_tasks = len(tasks)
+        results: List[Optional[Dict[str, Any]]] = [None] * total_tasks
+        ids = [task.get("task_id", f"T{idx+1}") for idx, task in enumerate(tasks)]
+        semaphore = asyncio.Semaphore(self.max_parallel_tasks)
+
+        # Only wait on dependencies from earlier layers, so cycles cannot deadlock
+        layer_of = {idx: layer for layer, wave in enumerate(self._plan_waves(tasks)) for idx in wave}
+        runs: Dict[int, "asyncio.Future[Dict[str, Any]]"] = {}
+
+        async def code_task(idx: int) -> Dict[str, Any]:
+            task = tasks[idx]
+            task_title = task.get("title", "Untitled")
+            dependencies = task.get("dependencies") or []
+
+            upstream = [
+                runs[dep] for dep, dep_id in enumerate(ids)
+                if dep_id in dependencies and layer_of[dep] < layer_of[idx]
+            ]
+            if upstream:
+                await asyncio.gather(*upstream)
+
+            # Feed the outputs of completed dependencies to downstream tasks
+            completed = {
+                ids[dep]: results[dep].get("created_files", [])
+                for dep, dep_id in enumerate(ids)
+                if dep_id in dependencies and results[dep] is not None
+            }
+
+            async with semaphore:
+                progress_msg = f"Generating code for task {idx+1}/{total_tasks}: {task_title}"
+                self._update_progress(progress_msg, callback, idx+1, total_tasks)
+                results[idx] = await self._code_task(task, ids[idx], plan, completed)
+                return results[idx]
+
+        try:
+            for idx in sorted(layer_of, key=layer_of.get):
+                runs[idx] = asyncio.ensure_future(code_task(idx))
+            await asyncio.gather(*runs.values())
+        except BaseException:
+            # One task failed: stop the others writing files before the phase reports it
+            await _cancel_runs(list(runs.values()))
+            raise
+
+        return results
+
+    async def _code_task(
+            self,
+            task: Dict[str, Any],
+            task_id: str,
+            plan: Dict[str, Any],
+            completed: Dict[str, List[str]]
+    ) -> Dict[str, Any]:
+        """Generate code for one task, given the files its dependencies created"""
+        self.logger.info("Executing task: %s - %s", task_id, task.get("title", "Untitled"))
+        self.state["current_task"] = task_id
+
+        context = dict(plan, completed_dependencies=completed) if completed else plan
+        self_review = self.self_review and len(task.get("files") or []) <= self.SELF_REVIEW_MAX_FILES
+        return await self.coding_agent.aexecute(task, context=context, self_review=self_review)
+
+    async def _execute_pipelined(self, task_description: str, callback=None):
+        """
+        Plan with a streamed response, generating code for each task as soon as it is planned
+
+        A task waits only for the dependencies planned before it, and its
+        context is the part of the plan streamed so far.
+
+        Returns:
+            (planning result, (code generation results, the streamed task id
+            each is for)), or (planning result, None) when a cached plan is reused
+        """
+        self.logger.info("Phase 1+2: Streamed Planning with Pipelined Code Generation")
+
+        plan = self._cached_plan(task_description)
+        if plan is not None:
+            self.logger.info("Reusing cached plan with %s tasks", len(plan["tasks"]))
+            return {"success": True, "plan": plan}, None
+
+        tasks: List[Dict[str, Any]] = []
+        ids: List[str] = []
+        index_of: Dict[str, int] = {}
+        results: List[Optional[Dict[str, Any]]] = []
+        runs: List["asyncio.Future[Dict[str, Any]]"] = []
+        semaphore = asyncio.Semaphore(self.max_parallel_tasks)
+
+        async def code_task(idx: int, upstream: List[int], plan: Dict[str, Any]) -> Dict[str, Any]:
+            if upstream:
+                await asyncio.gather(*[runs[dep] for dep in upstream])
+            completed = {ids[dep]: results[dep].get("created_files", []) for dep in upstream}
+
+            async with semaphore:
+                progress_msg = f"Generating code for task {idx+1}: {tasks[idx].get('title', 'Untitled')}"
+                self._update_progress(progress_msg, callback, status="coding")
+                results[idx] = await self._code_task(tasks[idx], ids[idx], plan, completed)
+                return results[idx]
+
+        header: Dict[str, Any] = {}
+        planning_result = None
+        try:
+            async for event, payload in self.planning_agent.astream_execute(task_description):
+                if event == "header":
+                    header = payload
+                elif event == "task":
+                    idx = len(tasks)
+                    tasks.append(payload)
+                    ids.append(payload.get("task_id", f"T{idx+1}"))
+                    index_of.setdefault(ids[idx], idx)
+                    results.append(None)
+                    upstream = sorted({
+                        index_of[dep] for dep in (payload.get("dependencies") or [])
+                        if dep in index_of and index_of[dep] != idx
+                    })
+                    runs.append(asyncio.ensure_future(code_task(idx, upstream, dict(header, tasks=list(tasks)))))
+                else:
+                    planning_result = payload
+
+            # Let tasks already started finish even if the rest of the plan failed
+            coding_results = await asyncio.gather(*runs)
+        except BaseException:
+            # A task raised (or planning did): stop the others writing files before the phase reports it
+            await _cancel_runs(runs)
+            raise
+
+        if planning_result["success"]:
+            self.logger.info("Planning completed successfully")
+            if self.plan_cache is not None:
+                self.plan_cache.store(task_description, planning_result["plan"], scope=self._plan_scope())
+        else:
+            self.logger.error("Planning failed")
+
+        return planning_result, (coding_results, ids)
+
+    async def _execute_evaluation(self, callback=None) -> Dict[str, Any]:
         """Execute evaluation phase"""
         self.logger.info("Phase 3: Code Evaluation")
 
@@ -200,50 +542,81 @@ class MultiAgentOrchestrator:
         self._update_progress("Evaluating generated code...", callback)
 
         # Evaluate based on original plan
+        to_evaluate = []
         for task in self.state["tasks_completed"]:
             # Find the task object
             task_obj = next((t for t in self.state["plan"]["tasks"] if t["task_id"] == task), None)
 
-            if not task_obj:
+            # Only tasks that declare files can be evaluated
+            if not (task_obj and task_obj.get("files")):
                 continue
 
-            # Get files for this task
-            task_files = task_obj.get("files", [])
-
-            if not task_files:
-                continue
+            if task in self.state["self_evaluations"]:
+                # Reviewed by the coding agent in the same conversation
+                evaluation = self.state["self_evaluations"][task]
+                self._record_evaluation(evaluation)
+                self.logger.info("Task %s self-evaluation: %s", task, evaluation.get("overall_quality", "unknown"))
+            else:
+                to_evaluate.append((task, task_obj))
 
-            # Evaluate
-            result = self.evaluation_agent.execute(
-                task=task_obj,
-                files=task_files,
-                context=self.state["plan"]
-            )
+        # One review request covers every task that fits in a batch
+        results = await self.evaluation_agent.aexecute_batch(
+            tasks=[task_obj for _, task_obj in to_evaluate],
+            context=self.state["plan"]
+        )
 
+        for (task, _), result in zip(to_evaluate, results):
             if result["success"]:
-                self.state["evaluations"].append(result["evaluation"])
+                self._record_evaluation(result["evaluation"])
                 quality = result["evaluation"].get("overall_quality", "unknown")
-                self.logger.info(f"Task {task} evaluation: {quality}")
+                self.logger.info("Task %s evaluation: %s", task, quality)
             else:
-                self.logger.warning(f"Evaluation failed for task {task}")
+                self.logger.warning("Evaluation failed for task %s", task)
 
         return {
             "success": True,
             "evaluations": self.state["evaluations"]
         }
 
-    def _execute_debugging(self, callback=None, task_description: str = "") -> Dict[str, Any]:
-        """Execute debugging and fixing phase"""
+    def _apply_fixers(self, callback=None) -> List[str]:
+        """Patch pattern-matchable issues in the generated files; returns the changed paths"""
+        if not self.state["all_created_files"]:
+            return []
+
+        self._update_progress("Analyzing code for common issues (CORS, API problems)...", callback, status="debugging")
+
+        patched_files = apply_fixers(self.state["all_created_files"], self.tool_manager)
+        if patched_files:
+            self.logger.info("Deterministic fixes applied to %s files", len(patched_files))
+        return patched_files
+
+    def _execute_debugging(
+            self,
+            callback=None,
+            task_description: str = "",
+            patched_files: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Execute debugging and fixing phase, on top of the deterministic fixes already applied"""
         self.logger.info("Phase 3.5: Code Debugging and Fixing")
 
         if not self.state["all_created_files"]:
             self.logger.warning("No files to debug")
             return {"success": True, "fixed_files": []}
 
-        self._update_progress("Analyzing code for common issues (CORS, API problems)...", callback)
+        patched_files = patched_files or []
+
+        if not self.llm_debugging:
+            self._update_progress(f"Fixed {len(patched_files)} files without LLM analysis", callback, status="debugging")
+            return {"success": True, "fixed_files": patched_files}
+
+        try:
+            debugger_agent = self.debugger_agent
+        except ImportError as e:
+            self.logger.warning("Debugger agent unavailable, keeping deterministic fixes only: %s", e)
+            return {"success": True, "fixed_files": patched_files}
 
         # Run debugger agent on all created files
-        result = self.debugger_agent.analyze_and_fix(
+        result = debugger_agent.analyze_and_fix(
             files=self.state["all_created_files"],
             project_description=task_description
         )
@@ -251,8 +624,8 @@ class MultiAgentOrchestrator:
         if result["success"]:
             fixed_files = result.get("fixed_files", [])
             if fixed_files:
-                self.logger.info(f"Fixed {len(fixed_files)} files")
-                self._update_progress(f"Fixed {len(fixed_files)} issues in generated code", callback)
+                self.logger.info("Fixed %s files", len(fixed_files))
+                self._update_progress(f"Fixed {len(fixed_files)} issues in generated code", callback, status="debugging")
 
                 # Update created files list with fixed versions
                 for fixed_file in fixed_files:
@@ -260,52 +633,104 @@ class MultiAgentOrchestrator:
                         self.state["all_created_files"].append(fixed_file)
             else:
                 self.logger.info("No critical issues found that need fixing")
-                self._update_progress("Code analysis complete - no critical issues found", callback)
+                self._update_progress("Code analysis complete - no critical issues found", callback, status="debugging")
 
             # Log analysis
             analysis = result.get("analysis")
-            if analysis:
+            if analysis and self.logger.isEnabledFor(logging.INFO):
                 issues = analysis.get("issues_found", [])
-                self.logger.info(f"Debug analysis found {len(issues)} issues")
+                self.logger.info("Debug analysis found %s issues", len(issues))
                 for issue in issues:
-                    self.logger.info(f"  - {issue.get('type')}: {issue.get('description')}")
+                    self.logger.info("  - %s: %s", issue.get('type'), issue.get('description'))
 
         else:
-            self.logger.warning(f"Debugging failed: {result.get('error')}")
+            self.logger.warning("Debugging failed: %s", result.get('error'))
 
         return {
             "success": True,
-            "fixed_files": result.get("fixed_files", [])
+            "fixed_files": patched_files + [f for f in result.get("fixed_files", []) if f not in patched_files]
         }
 
-    def _should_iterate(self) -> bool:
-        """Determine if we should iterate based on evaluations"""
-        # Check if any evaluation found critical issues
-        for evaluation in self.state["evaluations"]:
-            if evaluation.get("overall_quality") == "poor":
-                return True
+    def _record_evaluation(self, evaluation: Dict[str, Any]):
+        """Store an evaluation, noting once whether it calls for another iteration"""
+        self.state["evaluations"].append(evaluation)
 
-            # Check for critical issues
-            issues = evaluation.get("issues", [])
-            critical_issues = [i for i in issues if i.get("severity") == "critical"]
+        # Poor quality or any critical issue
+        if evaluation.get("overall_quality") == "poor" or any(
+            issue.get("severity") == "critical" for issue in evaluation.get("issues") or []
+        ):
+            self.state["evaluations_needing_rework"] += 1
 
-            if critical_issues:
-                return True
+    def _should_iterate(self) -> bool:
+        """Determine if we should iterate based on evaluations"""
+        return self.state["evaluations_needing_rework"] > 0
 
-        return False
+    def _update_progress(
+            self,
+            message: str,
+            callback=None,
+            current: int = 0,
+            total: int = 0,
+            status: Optional[str] = None
+    ):
+        """
+        Update progress and call callback if provided; status defaults to the current phase
 
-    def _update_progress(self, message: str, callback=None, current: int = 0, total: int = 0):
-        """Update progress and call callback if provided"""
+        During a run the callback is invoked from a dispatch thread, so a slow
+        consumer never blocks the agents.
+        """
         self.logger.info(message)
 
         if callback:
-            callback({
+            update = {
                 "message": message,
-                "status": self.state["status"],
+                "status": status or self.state["status"],
                 "current": current,
                 "total": total,
                 "files_created": len(self.state["all_created_files"])
-            })
+            }
+            progress_queue = self._progress_queue
+            if progress_queue is None:
+                callback(update)
+                return
+
+            while True:
+                try:
+                    progress_queue.put_nowait(update)
+                    break
+                except queue.Full:
+                    # Progress is lossy: drop the oldest update rather than wait
+                    try:
+                        progress_queue.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def _start_progress_dispatch(self, callback) -> Optional[threading.Thread]:
+        """Start the thread that delivers progress updates to the callback"""
+        if callback is None:
+            return None
+
+        self._progress_queue = queue.Queue(maxsize=self.PROGRESS_QUEUE_SIZE)
+        thread = threading.Thread(
+            target=self._dispatch_progress,
+            args=(callback, self._progress_queue),
+            name="progress-dispatch",
+            daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _dispatch_progress(self, callback, progress_queue: queue.Queue):
+        """Deliver queued progress updates until the None sentinel arrives"""
+        while True:
+            update = progress_queue.get()
+            if update is None:
+                return
+            try:
+                callback(update)
+            except Exception as e:
+                # A failing consumer must not take the run down with it
+                self.logger.warning("Progress callback failed: %s", e)
 
     def _build_result(self, success: bool, error: Optional[str] = None) -> Dict[str, Any]:
         """Build final result dictionary"""
@@ -330,12 +755,25 @@ class MultiAgentOrchestrator:
 
         return result
 
+    def prewarm(self):
+        """
+        Pay one-time setup costs before the first request
+
+        Loads the tokenizer, so a long-running service does not charge it to
+        its first execute().
+        """
+        count_tokens("warm-up")
+
     def get_state(self) -> Dict[str, Any]:
         """Get current orchestrator state"""
         return self.state.copy()
 
     def reset(self):
-        """Reset orchestrator state"""
+        """Reset orchestrator state, keeping the agents for the next execute()"""
+        self.tool_manager.clear_cache()
+        for agent in self._agents.values():
+            if hasattr(agent, "reset_conversation"):
+                agent.reset_conversation()
         self.state = {
             "status": "idle",
             "current_task": None,
@@ -344,6 +782,8 @@ class MultiAgentOrchestrator:
             "tasks_pending": [],
             "all_created_files": [],
             "evaluations": [],
+            "self_evaluations": {},
+            "evaluations_needing_rework": 0,
             "iterations": 0,
             "start_time": None,
             "end_time": None
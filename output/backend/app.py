@@ -1,136 +1,350 @@
-import os
-import requests
-import xml.etree.ElementTree as ET
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import logging
-from datetime import datetime, timedelta
-
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}})
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, 
-                    format='%(asctime)s - %(levelname)s: %(message)s')
-logger = logging.getLogger(__name__)
-
-# ArXiv API base URL
-ARXIV_API_BASE_URL = 'http://export.arxiv.org/api/query'
-
-# CS Categories to support
-CS_CATEGORIES = [
-    'cs.AI', 'cs.CL', 'cs.CV', 'cs.DB', 'cs.DC', 
-    'cs.DL', 'cs.GR', 'cs.HC', 'cs.IR', 'cs.IT', 
-    'cs.LG', 'cs.MA', 'cs.MM', 'cs.NE', 'cs.PL', 
-    'cs.RO', 'cs.SE', 'cs.SI', 'cs.SY'
-]
-
-def parse_arxiv_xml(xml_content):
-    """
-    Parse ArXiv XML response and convert to JSON-friendly format
-    """
-    try:
-        root = ET.fromstring(xml_content)
-        
-        # Define XML namespaces
-        namespaces = {
-            'atom': 'http://www.w3.org/2005/Atom',
-            'arxiv': 'http://arxiv.org/schemas/atom'
-        }
-        
-        papers = []
-        for entry in root.findall('atom:entry', namespaces):
-            try:
-                paper = {
-                    'id': entry.find('atom:id', namespaces).text.split('/')[-1],
-                    'title': entry.find('atom:title', namespaces).text.strip(),
-                    'summary': entry.find('atom:summary', namespaces).text.strip(),
-                    'published': entry.find('atom:published', namespaces).text,
-                    'authors': [
-                        author.find('atom:name', namespaces).text 
-                        for author in entry.findall('atom:author', namespaces)
-                    ],
-                    'links': {
-                        'pdf': next(
-                            (link.get('href') for link in entry.findall('atom:link', namespaces) 
-                             if link.get('type') == 'application/pdf'), 
-                            None
-                        ),
-                        'abs': next(
-                            (link.get('href') for link in entry.findall('atom:link', namespaces) 
-                             if link.get('rel') == 'alternate'), 
-                            None
-                        )
-                    },
-                    'categories': [
-                        cat.get('term') for cat in entry.findall('arxiv:primary_category', namespaces)
-                    ] + [
-                        cat.get('term') for cat in entry.findall('atom:category', namespaces)
-                    ]
-                }
-                papers.append(paper)
-            except Exception as entry_error:
-                logger.warning(f"Error parsing individual entry: {entry_error}")
-        
-        return papers
-    except Exception as parse_error:
-        logger.error(f"XML Parsing Error: {parse_error}")
-        return []
-
-@app.route('/arxiv/papers', methods=['GET'])
-def fetch_arxiv_papers():
-    """
-    Proxy route for fetching ArXiv papers with robust error handling
-    """
-    try:
-        # Extract query parameters
-        category = request.args.get('category', 'cs.AI')
-        max_results = int(request.args.get('max_results', 20))
-        start = int(request.args.get('start', 0))
-
-        # Validate category
-        if category not in CS_CATEGORIES:
-            return jsonify({
-                'error': 'Invalid category',
-                'valid_categories': CS_CATEGORIES
-            }), 400
-
-        # Construct ArXiv API query
-        params = {
-            'search_query': f'cat:{category}',
-            'start': start,
-            'max_results': max_results,
-            'sortBy': 'submittedDate',
-            'sortOrder': 'descending'
-        }
-
-        # Make request to ArXiv API
-        try:
-            response = requests.get(ARXIV_API_BASE_URL, params=params)
-            response.raise_for_status()
-        except requests.RequestException as req_error:
-            logger.error(f"ArXiv API Request Error: {req_error}")
-            return jsonify({
-                'error': 'Failed to fetch papers from ArXiv',
-                'details': str(req_error)
-            }), 500
-
-        # Parse XML response
-        papers = parse_arxiv_xml(response.text)
-
-        return jsonify({
-            'papers': papers,
-            'total_results': len(papers),
-            'category': category,
-            'timestamp': datetime.utcnow().isoformat()
-        })
-
-    except Exception as e:
-        logger.error(f"Unexpected error in fetch_arxiv_papers: {e}")
-        return jsonify({
-            'error': 'Unexpected server error',
-            'details': str(e)
-        }), 500
-
-if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+try:
+    # libxml2-backed parser, API compatible with ElementTree
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+from flask import Flask, request, jsonify
+from flask_cors import CORS
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:
+    WsgiToAsgi = None
+try:
+    import orjson
+    from flask.json.provider import JSONProvider
+except ImportError:
+    orjson = None
+try:
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+app = Flask(__name__)
+CORS(app, resources={r"/*": {"origins": "*"}})
+
+if orjson is not None:
+    class ORJSONProvider(JSONProvider):
+        """
+        Serialize jsonify responses with orjson instead of the standard library
+        """
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = ORJSONProvider(app)
+
+# Paper lists are mostly abstract text and shrink several-fold under gzip
+GZIP_MIN_SIZE = 1024
+if Compress is not None:
+    Compress(app)
+else:
+    @app.after_request
+    def gzip_response(response):
+        """
+        Gzip sizeable JSON responses for clients that accept it
+        """
+        if (response.status_code != 200
+                or response.direct_passthrough
+                or response.mimetype != 'application/json'
+                or 'Content-Encoding' in response.headers
+                or 'gzip' not in request.headers.get('Accept-Encoding', '').lower()):
+            return response
+
+        data = response.get_data()
+        if len(data) < GZIP_MIN_SIZE:
+            return response
+
+        response.set_data(gzip.compress(data, compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
+
+# ASGI entry point for multi-worker serving, e.g.
+#   uvicorn app:asgi_app --workers 4
+# Each request still runs in a worker thread, so routes must stay thread-safe.
+asgi_app = WsgiToAsgi(app) if WsgiToAsgi is not None else None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, 
+                    format='%(asctime)s - %(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+# ArXiv API base URL
+ARXIV_API_BASE_URL = 'http://export.arxiv.org/api/query'
+
+# Keep-alive connections to ArXiv, reused across requests and worker threads
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+))
+SESSION.mount('https://', SESSION.get_adapter('http://'))
+
+# (connect, read) timeout in seconds for ArXiv requests
+ARXIV_TIMEOUT = (3, 10)
+
+# Fetches the categories of a multi-category request concurrently
+_fetch_pool = ThreadPoolExecutor(max_workers=8)
+
+# CS Categories to support
+CS_CATEGORIES = (
+    'cs.AI', 'cs.CL', 'cs.CV', 'cs.DB', 'cs.DC', 
+    'cs.DL', 'cs.GR', 'cs.HC', 'cs.IR', 'cs.IT', 
+    'cs.LG', 'cs.MA', 'cs.MM', 'cs.NE', 'cs.PL', 
+    'cs.RO', 'cs.SE', 'cs.SI', 'cs.SY'
+)
+CS_CATEGORY_SET = frozenset(CS_CATEGORIES)
+
+# The invalid-category reply never changes, so it is serialized once
+INVALID_CATEGORY_RESPONSE = (
+    json.dumps({'error': 'Invalid category', 'valid_categories': list(CS_CATEGORIES)}),
+    400,
+    {'Content-Type': 'application/json'}
+)
+
+# ArXiv Atom feed XML namespaces
+NAMESPACES = {
+    'atom': 'http://www.w3.org/2005/Atom',
+    'arxiv': 'http://arxiv.org/schemas/atom'
+}
+
+# Recently fetched results: (category, start, max_results) -> (expiry, etag, papers)
+PAPER_CACHE_TTL = 300
+PAPER_CACHE_SIZE = 256
+_paper_cache = OrderedDict()
+_paper_cache_lock = threading.Lock()
+
+def get_cached_papers(key):
+    """
+    Return (etag, papers) cached for a query, or None if absent or expired
+    """
+    with _paper_cache_lock:
+        cached = _paper_cache.get(key)
+        if cached is None or cached[0] <= time.monotonic():
+            return None
+        _paper_cache.move_to_end(key)
+        return cached[1], cached[2]
+
+def cache_papers(key, papers, etag):
+    """
+    Cache parsed papers for a query, evicting the least recently used entry when full
+    """
+    with _paper_cache_lock:
+        _paper_cache[key] = (time.monotonic() + PAPER_CACHE_TTL, etag, papers)
+        _paper_cache.move_to_end(key)
+        if len(_paper_cache) > PAPER_CACHE_SIZE:
+            _paper_cache.popitem(last=False)
+
+def fetch_papers(category, start, max_results):
+    """
+    Fetch and parse one page of a category's papers, serving repeats from the cache
+
+    Returns (etag, papers); raises requests.RequestException if ArXiv fails
+    """
+    cache_key = (category, start, max_results)
+    cached = get_cached_papers(cache_key)
+    if cached is not None:
+        return cached
+
+    # Construct ArXiv API query
+    params = {
+        'search_query': f'cat:{category}',
+        'start': start,
+        'max_results': max_results,
+        'sortBy': 'submittedDate',
+        'sortOrder': 'descending'
+    }
+
+    response = SESSION.get(ARXIV_API_BASE_URL, params=params, timeout=ARXIV_TIMEOUT)
+    response.raise_for_status()
+
+    # Parse XML response
+    papers = parse_arxiv_xml(response.content)
+    etag = hashlib.blake2b(response.content, digest_size=16).hexdigest()
+    if papers:
+        cache_papers(cache_key, papers, etag)
+    return etag, papers
+
+_xml_parsers = threading.local()
+
+
+def get_xml_parser():
+    """
+    Return this thread's hardened lxml parser, or None for ElementTree
+
+    The feed arrives over plain HTTP, so entities are left unresolved and
+    the network is never touched; lxml parsers must not be shared by threads.
+    """
+    if ET.__name__ != 'lxml.etree':
+        return None
+    parser = getattr(_xml_parsers, 'parser', None)
+    if parser is None:
+        parser = _xml_parsers.parser = ET.XMLParser(resolve_entities=False, no_network=True)
+    return parser
+
+
+def parse_arxiv_xml(xml_content):
+    """
+    Parse ArXiv XML response and convert to JSON-friendly format
+
+    xml_content should be the raw response bytes: lxml rejects str input
+    that carries an encoding declaration.
+    """
+    try:
+        root = ET.fromstring(xml_content, get_xml_parser())
+        namespaces = NAMESPACES
+        
+        papers = []
+        for entry in root.iterfind('atom:entry', namespaces):
+            try:
+                links = entry.findall('atom:link', namespaces)
+                paper = {
+                    'id': entry.findtext('atom:id', namespaces=namespaces).split('/')[-1],
+                    'title': entry.findtext('atom:title', namespaces=namespaces).strip(),
+                    'summary': entry.findtext('atom:summary', namespaces=namespaces).strip(),
+                    'published': entry.findtext('atom:published', namespaces=namespaces),
+                    'authors': [
+                        author.findtext('atom:name', namespaces=namespaces)
+                        for author in entry.iterfind('atom:author', namespaces)
+                    ],
+                    'links': {
+                        'pdf': next(
+                            (link.get('href') for link in links
+                             if link.get('type') == 'application/pdf'), 
+                            None
+                        ),
+                        'abs': next(
+                            (link.get('href') for link in links
+                             if link.get('rel') == 'alternate'), 
+                            None
+                        )
+                    },
+                    'categories': [
+                        cat.get('term') for cat in entry.iterfind('arxiv:primary_category', namespaces)
+                    ] + [
+                        cat.get('term') for cat in entry.iterfind('atom:category', namespaces)
+                    ]
+                }
+                papers.append(paper)
+            except Exception as entry_error:
+                logger.warning(f"Error parsing individual entry: {entry_error}")
+        
+        return papers
+    except Exception as parse_error:
+        logger.error(f"XML Parsing Error: {parse_error}")
+        return []
+
+@app.route('/arxiv/papers', methods=['GET'])
+def fetch_arxiv_papers():
+    """
+    Proxy route for fetching ArXiv papers with robust error handling
+    """
+    try:
+        # Extract query parameters
+        category = request.args.get('category', 'cs.AI')
+        max_results = int(request.args.get('max_results', 20))
+        start = int(request.args.get('start', 0))
+
+        # Validate category
+        if category not in CS_CATEGORY_SET:
+            return INVALID_CATEGORY_RESPONSE
+
+        # Make request to ArXiv API (repeated queries are served from memory)
+        try:
+            etag, papers = fetch_papers(category, start, max_results)
+        except requests.RequestException as req_error:
+            logger.error(f"ArXiv API Request Error: {req_error}")
+            return jsonify({
+                'error': 'Failed to fetch papers from ArXiv',
+                'details': str(req_error)
+            }), 500
+
+        result = jsonify({
+            'papers': papers,
+            'total_results': len(papers),
+            'category': category,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+
+        # Let browsers and proxies reuse the response for the cache lifetime too
+        result.cache_control.public = True
+        result.cache_control.max_age = PAPER_CACHE_TTL
+        result.set_etag(etag)
+        return result.make_conditional(request)
+
+    except Exception as e:
+        logger.error(f"Unexpected error in fetch_arxiv_papers: {e}")
+        return jsonify({
+            'error': 'Unexpected server error',
+            'details': str(e)
+        }), 500
+
+@app.route('/arxiv/papers/multi', methods=['GET'])
+def fetch_arxiv_papers_multi():
+    """
+    Fetch papers for several categories at once, querying ArXiv concurrently
+    """
+    try:
+        # Extract query parameters
+        categories = [c for c in request.args.get('categories', 'cs.AI').split(',') if c]
+        max_results = int(request.args.get('max_results', 20))
+        start = int(request.args.get('start', 0))
+
+        # Validate categories
+        invalid = [c for c in categories if c not in CS_CATEGORY_SET]
+        if invalid:
+            return jsonify({
+                'error': 'Invalid category',
+                'invalid_categories': invalid,
+                'valid_categories': list(CS_CATEGORIES)
+            }), 400
+
+        futures = {
+            category: _fetch_pool.submit(fetch_papers, category, start, max_results)
+            for category in categories
+        }
+
+        # A failing category is reported in place instead of failing the whole request
+        results = {}
+        for category, future in futures.items():
+            try:
+                _, papers = future.result()
+                results[category] = {'papers': papers, 'total_results': len(papers)}
+            except requests.RequestException as req_error:
+                logger.error(f"ArXiv API Request Error for {category}: {req_error}")
+                results[category] = {
+                    'error': 'Failed to fetch papers from ArXiv',
+                    'details': str(req_error)
+                }
+
+        return jsonify({
+            'results': results,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        logger.error(f"Unexpected error in fetch_arxiv_papers_multi: {e}")
+        return jsonify({
+            'error': 'Unexpected server error',
+            'details': str(e)
+        }), 500
+
+if __name__ == '__main__':
+    # Development server: one thread per request so slow ArXiv calls don't queue others
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1', port=5000, threaded=True)
\ No newline at end of file
@@ -4,408 +4,725 @@ Provides filesystem, web search, and code execution capabilities
 """
 
 import os
+import re
+import copy
 import json
-import subprocess
-import requests
-from typing import Dict, List, Any, Optional
+import shlex
+import shutil
+import inspect
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Any, Optional, Iterator, Callable, Tuple
 from pathlib import Path
 
 
+def _scandir_files(path: str, prefix_len: int) -> Iterator[str]:
+    """Yield paths of all files under path, minus their first prefix_len characters, using cached DirEntry types"""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                yield entry.path[prefix_len:]
+            elif entry.is_dir(follow_symlinks=False):
+                yield from _scandir_files(entry.path, prefix_len)
+
+
+def _ok(**fields) -> Dict[str, Any]:
+    """Successful tool result carrying the given fields"""
+    return {"success": True, **fields}
+
+
+def _err(message: str) -> Dict[str, Any]:
+    """Failed tool result with an error message"""
+    return {"success": False, "message": message}
+
+
+def _call_tool(
+        method: Callable[..., Dict[str, Any]],
+        params: Tuple[str, ...],
+        required: Tuple[str, ...],
+        arguments: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Call a tool method with LLM-supplied arguments, passed positionally where possible"""
+    missing = [name for name in required if name not in arguments]
+    if missing:
+        return _err(f"Missing required arguments: {', '.join(missing)}")
+
+    values = []
+    for i, name in enumerate(params):
+        if name not in arguments:
+            # An optional parameter was left out; pass the rest by keyword
+            return method(*values, **{rest: arguments[rest] for rest in params[i + 1:] if rest in arguments})
+        values.append(arguments[name])
+    return method(*values)
+
+
+# Raw fd I/O must not translate line endings on Windows
+_O_BINARY = getattr(os, "O_BINARY", 0)
+
+
+def _read_text(path: str) -> str:
+    """Read a UTF-8 file through the fd directly, skipping the buffered text-IO stack"""
+    fd = os.open(path, os.O_RDONLY | _O_BINARY)
+    try:
+        size = os.fstat(fd).st_size
+        chunks = []
+        while True:
+            # Read past the stat size so files that grew meanwhile are read to the end
+            chunk = os.read(fd, max(size, 65536))
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+
+    return _decode(b"".join(chunks))
+
+
+def _decode(data: bytes, errors: str = "strict") -> str:
+    """Decode UTF-8 with universal newlines, as text-mode I/O would"""
+    text = data.decode("utf-8", errors)
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _write_text(path: str, content: str):
+    """Write a UTF-8 file through the fd directly, replacing any existing content"""
+    data = memoryview(content.encode("utf-8"))
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | _O_BINARY, 0o644)
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+
+# Most buffers one writev call accepts
+_IOV_MAX = os.sysconf("SC_IOV_MAX") if "SC_IOV_MAX" in getattr(os, "sysconf_names", {}) else 1024
+
+
+def _write_parts(path: str, parts: List[str]):
+    """Write the UTF-8 encoded parts back to back, gathered by writev instead of joined first"""
+    buffers = [memoryview(part.encode("utf-8")) for part in parts if part]
+    if not hasattr(os, "writev"):
+        # No scatter/gather I/O on this platform (Windows)
+        _write_text(path, "".join(parts))
+        return
+
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | _O_BINARY, 0o644)
+    try:
+        start = 0
+        while start < len(buffers):
+            written = os.writev(fd, buffers[start:start + _IOV_MAX])
+            # Skip fully written buffers and trim a partially written one
+            while written and written >= len(buffers[start]):
+                written -= len(buffers[start])
+                start += 1
+            if written:
+                buffers[start] = buffers[start][written:]
+    finally:
+        os.close(fd)
+
+
+# Filesystem tool schemas in OpenAI function calling format; never mutated
+_FS_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "create_file",
+            "description": "Create a new file with specified content",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "file_path": {
+                        "type": "string",
+                        "description": "Path to the file to create (relative to output directory)"
+                    },
+                    "content": {
+                        "type": "string",
+                        "description": "Content to write to the file"
+                    }
+                },
+                "required": ["file_path", "content"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "create_file_parts",
+            "description": "Create a new file from several content parts written in order, e.g. a header, body and footer",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "file_path": {
+                        "type": "string",
+                        "description": "Path to the file to create (relative to output directory)"
+                    },
+                    "parts": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Content parts, concatenated in order"
+                    }
+                },
+                "required": ["file_path", "parts"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "read_file",
+            "description": "Read content from a file",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "file_path": {
+                        "type": "string",
+                        "description": "Path to the file to read"
+                    }
+                },
+                "required": ["file_path"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "list_files",
+            "description": "List all files in a directory",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "directory": {
+                        "type": "string",
+                        "description": "Directory path to list files from"
+                    }
+                },
+                "required": ["directory"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "create_directory",
+            "description": "Create a new directory",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "dir_path": {
+                        "type": "string",
+                        "description": "Path to the directory to create"
+                    }
+                },
+                "required": ["dir_path"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "copy_file",
+            "description": "Copy an existing file to a new path, without reading its content",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "src_path": {
+                        "type": "string",
+                        "description": "Path of the file to copy"
+                    },
+                    "dst_path": {
+                        "type": "string",
+                        "description": "Path of the copy (relative to output directory)"
+                    }
+                },
+                "required": ["src_path", "dst_path"]
+            }
+        }
+    }
+]
+
+
+# Web search tool schemas in OpenAI function calling format; never mutated
+_WEB_SEARCH_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "web_search",
+            "description": "Search the web for information (simulated)",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Search query"
+                    }
+                },
+                "required": ["query"]
+            }
+        }
+    }
+]
+
+
+# Code execution tool schemas in OpenAI function calling format; never mutated
+_CODE_EXECUTION_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "execute_command",
+            "description": "Execute a shell command (use with caution, only for safe operations like validation)",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "command": {
+                        "type": "string",
+                        "description": "Command to execute"
+                    },
+                    "timeout": {
+                        "type": "integer",
+                        "description": "Timeout in seconds",
+                        "default": 30
+                    }
+                },
+                "required": ["command"]
+            }
+        }
+    }
+]
+
+
+# Commands execute_command runs directly, without a shell. This only picks the
+# fast path: it is not an allow-list, and any other command still runs via /bin/sh
+_SAFE_COMMANDS = frozenset(("ls", "cat", "echo", "pwd", "python", "node"))
+
+# Characters that need /bin/sh to interpret (pipes, redirects, globs, expansions, comments)
+_SHELL_CHARS = frozenset("|&;<>()$`*?[]{}~#\n")
+
+
+# Simulated web_search responses, keyed by a substring of the query
+_SIMULATED_RESPONSES = {
+    "bootstrap": {
+        "success": True,
+        "results": [
+            {
+                "title": "Bootstrap CDN",
+                "snippet": "Latest Bootstrap CSS: https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css"
+            }
+        ]
+    },
+    "jquery": {
+        "success": True,
+        "results": [
+            {
+                "title": "jQuery CDN",
+                "snippet": "Latest jQuery: https://code.jquery.com/jquery-3.6.0.min.js"
+            }
+        ]
+    },
+    "arxiv api": {
+        "success": True,
+        "results": [
+            {
+                "title": "arXiv API Documentation",
+                "snippet": "arXiv API base URL: http://export.arxiv.org/api/query. Example: http://export.arxiv.org/api/query?search_query=cat:cs.AI&start=0&max_results=10"
+            }
+        ]
+    }
+}
+
+# One scan of the query finds whichever key it contains
+_SIMULATED_KEY_RE = re.compile("|".join(re.escape(key) for key in _SIMULATED_RESPONSES))
+
+# The same responses serialized once, for callers that send them on as JSON
+_SIMULATED_JSON = {
+    key: json.dumps(response, ensure_ascii=False)
+    for key, response in _SIMULATED_RESPONSES.items()
+}
+
+# Serialized fallback response; the placeholder is replaced by the JSON-escaped query
+_QUERY_PLACEHOLDER = "@@QUERY@@"
+_DEFAULT_SEARCH_JSON = json.dumps({
+    "success": True,
+    "results": [
+        {
+            "title": f"Search results for: {_QUERY_PLACEHOLDER}",
+            "snippet": "Web search simulation - use appropriate CDN links and API endpoints for your implementation."
+        }
+    ]
+}, ensure_ascii=False)
+
+
 class ToolKit:
     """Base class for agent tools"""
 
     def __init__(self, base_dir: str = "./output"):
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(parents=True, exist_ok=True)
+        # Tool calls join paths onto this string instead of doing Path arithmetic
+        self._base_str = os.fspath(self.base_dir)
+        # Normalized absolute base; paths under it are made relative by slicing
+        self._base_abs = os.path.abspath(self._base_str)
+
+        # Tool name -> callable taking the arguments dict, filled in by subclasses
+        self._dispatch: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+
+    @staticmethod
+    def _bind(method: Callable[..., Any]) -> Callable[[Dict[str, Any]], Any]:
+        """Adapt a method to take the LLM's arguments dict, resolving its parameters once"""
+        params = inspect.signature(method).parameters
+        required = tuple(name for name, param in params.items() if param.default is param.empty)
+        return partial(_call_tool, method, tuple(params), required)
+
+    def _register(self, *methods: Callable[..., Dict[str, Any]]):
+        """Expose methods as tools named after them"""
+        for method in methods:
+            self._dispatch[method.__name__] = self._bind(method)
 
     def get_available_tools(self) -> List[Dict[str, Any]]:
         """Return list of available tools in OpenAI function calling format"""
         raise NotImplementedError
 
+    def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute one of this kit's tools by name"""
+        tool = self._dispatch.get(tool_name)
+        if tool is None:
+            return _err(f"Unknown tool: {tool_name}")
+        return tool(arguments)
+
 
 class FilesystemTools(ToolKit):
     """Tools for filesystem operations"""
 
+    # Files whose content read_file keeps in memory
+    CONTENT_CACHE_SIZE = 64
+
+    def __init__(self, base_dir: str = "./output"):
+        super().__init__(base_dir)
+        # The file tools' only read cache. Normalized full path ->
+        # ((mtime_ns, size), content), least recently read first
+        self._content_cache: "OrderedDict[str, Tuple[Tuple[int, int], str]]" = OrderedDict()
+        self._content_lock = threading.Lock()
+        self._register(
+            self.create_file,
+            self.create_files,
+            self.create_file_parts,
+            self.read_file,
+            self.list_files,
+            self.create_directory,
+            self.copy_file
+        )
+
     def get_available_tools(self) -> List[Dict[str, Any]]:
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "create_file",
-                    "description": "Create a new file with specified content",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "file_path": {
-                                "type": "string",
-                                "description": "Path to the file to create (relative to output directory)"
-                            },
-                            "content": {
-                                "type": "string",
-                                "description": "Content to write to the file"
-                            }
-                        },
-                        "required": ["file_path", "content"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "read_file",
-                    "description": "Read content from a file",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "file_path": {
-                                "type": "string",
-                                "description": "Path to the file to read"
-                            }
-                        },
-                        "required": ["file_path"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "list_files",
-                    "description": "List all files in a directory",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "directory": {
-                                "type": "string",
-                                "description": "Directory path to list files from"
-                            }
-                        },
-                        "required": ["directory"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "create_directory",
-                    "description": "Create a new directory",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "dir_path": {
-                                "type": "string",
-                                "description": "Path to the directory to create"
-                            }
-                        },
-                        "required": ["dir_path"]
-                    }
-                }
-            }
-        ]
+        return _FS_TOOLS
 
     def create_file(self, file_path: str, content: str) -> Dict[str, Any]:
         """Create a new file with specified content"""
         try:
-            full_path = self.base_dir / file_path
-            full_path.parent.mkdir(parents=True, exist_ok=True)
+            full_path = os.path.join(self._base_str, file_path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
 
-            with open(full_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            self._forget(full_path)
+            _write_text(full_path, content)
 
-            return {
-                "success": True,
-                "message": f"File created successfully: {file_path}",
-                "path": str(full_path)
-            }
+            return _ok(
+                message=f"File created successfully: {file_path}",
+                path=full_path
+            )
         except Exception as e:
-            return {
-                "success": False,
-                "message": f"Error creating file: {str(e)}"
-            }
+            return _err(f"Error creating file: {str(e)}")
 
-    def read_file(self, file_path: str) -> Dict[str, Any]:
-        """Read content from a file"""
+    def create_file_parts(self, file_path: str, parts: List[str]) -> Dict[str, Any]:
+        """Create a new file from content parts, without concatenating them first"""
         try:
-            full_path = self.base_dir / file_path
+            full_path = os.path.join(self._base_str, file_path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
 
-            if not full_path.exists():
-                return {
-                    "success": False,
-                    "message": f"File not found: {file_path}"
-                }
+            self._forget(full_path)
+            _write_parts(full_path, parts)
 
-            with open(full_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            return _ok(
+                message=f"File created successfully: {file_path}",
+                path=full_path
+            )
+        except Exception as e:
+            return _err(f"Error creating file: {str(e)}")
+
+    def create_files(self, files: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Create several files in one call
+
+        Each parent directory is created once for the whole batch rather
+        than once per file. Failures are reported per file.
+        """
+        created, failed = [], []
+        made_dirs = set()
+        for item in files:
+            file_path = item.get("file_path", "")
+            try:
+                full_path = os.path.join(self._base_str, file_path)
+                parent = os.path.dirname(full_path)
+                if parent not in made_dirs:
+                    os.makedirs(parent, exist_ok=True)
+                    made_dirs.add(parent)
+                self._forget(full_path)
+                _write_text(full_path, item.get("content", ""))
+                created.append(file_path)
+            except Exception as e:
+                failed.append({"file_path": file_path, "message": f"Error creating file: {str(e)}"})
 
-            return {
-                "success": True,
-                "content": content,
-                "path": str(full_path)
-            }
+        return {
+            "success": not failed,
+            "message": f"Created {len(created)} of {len(files)} files",
+            "created": created,
+            "failed": failed
+        }
+
+    def _read_cached(self, full_path: str) -> str:
+        """Read a file, reusing the cached content while its mtime and size are unchanged"""
+        key = os.path.normpath(full_path)
+        st = os.stat(full_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._content_lock:
+            cached = self._content_cache.get(key)
+            if cached is not None and cached[0] == stamp:
+                self._content_cache.move_to_end(key)
+                return cached[1]
+
+        content = _read_text(full_path)
+        with self._content_lock:
+            self._content_cache[key] = (stamp, content)
+            self._content_cache.move_to_end(key)
+            if len(self._content_cache) > self.CONTENT_CACHE_SIZE:
+                self._content_cache.popitem(last=False)
+        return content
+
+    def clear_cache(self):
+        """Forget all cached file contents"""
+        with self._content_lock:
+            self._content_cache.clear()
+
+    def _forget(self, full_path: str):
+        """Drop a file's cached content; mtime alone misses rewrites within the clock's granularity"""
+        with self._content_lock:
+            self._content_cache.pop(os.path.normpath(full_path), None)
+
+    def read_file(self, file_path: str) -> Dict[str, Any]:
+        """Read content from a file"""
+        try:
+            full_path = os.path.join(self._base_str, file_path)
+            content = self._read_cached(full_path)
+
+            return _ok(
+                content=content,
+                path=full_path
+            )
+        except FileNotFoundError:
+            return _err(f"File not found: {file_path}")
         except Exception as e:
-            return {
-                "success": False,
-                "message": f"Error reading file: {str(e)}"
-            }
+            return _err(f"Error reading file: {str(e)}")
 
     def list_files(self, directory: str = ".") -> Dict[str, Any]:
         """List all files in a directory"""
         try:
-            full_path = self.base_dir / directory
-
-            if not full_path.exists():
-                return {
-                    "success": False,
-                    "message": f"Directory not found: {directory}"
-                }
-
-            files = []
-            for item in full_path.rglob("*"):
-                if item.is_file():
-                    rel_path = item.relative_to(self.base_dir)
-                    files.append(str(rel_path))
-
-            return {
-                "success": True,
-                "files": files,
-                "count": len(files)
-            }
+            full_path = os.path.normpath(os.path.join(self._base_abs, directory))
+            prefix = self._base_abs.rstrip(os.sep) + os.sep
+            if full_path == self._base_abs or full_path.startswith(prefix):
+                files = list(_scandir_files(full_path, len(prefix)))
+            else:
+                # Outside the output directory; no common prefix to slice
+                files = [os.path.relpath(path, self._base_abs) for path in _scandir_files(full_path, 0)]
+
+            return _ok(
+                files=files,
+                count=len(files)
+            )
+        except (FileNotFoundError, NotADirectoryError):
+            return _err(f"Directory not found: {directory}")
         except Exception as e:
-            return {
-                "success": False,
-                "message": f"Error listing files: {str(e)}"
-            }
+            return _err(f"Error listing files: {str(e)}")
 
     def create_directory(self, dir_path: str) -> Dict[str, Any]:
         """Create a new directory"""
         try:
-            full_path = self.base_dir / dir_path
-            full_path.mkdir(parents=True, exist_ok=True)
+            full_path = os.path.join(self._base_str, dir_path)
+            os.makedirs(full_path, exist_ok=True)
 
-            return {
-                "success": True,
-                "message": f"Directory created successfully: {dir_path}",
-                "path": str(full_path)
-            }
+            return _ok(
+                message=f"Directory created successfully: {dir_path}",
+                path=full_path
+            )
         except Exception as e:
-            return {
-                "success": False,
-                "message": f"Error creating directory: {str(e)}"
-            }
+            return _err(f"Error creating directory: {str(e)}")
 
-    def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute a filesystem tool"""
-        if tool_name == "create_file":
-            return self.create_file(**arguments)
-        elif tool_name == "read_file":
-            return self.read_file(**arguments)
-        elif tool_name == "list_files":
-            return self.list_files(**arguments)
-        elif tool_name == "create_directory":
-            return self.create_directory(**arguments)
-        else:
-            return {
-                "success": False,
-                "message": f"Unknown tool: {tool_name}"
-            }
+    def copy_file(self, src_path: str, dst_path: str) -> Dict[str, Any]:
+        """Copy a file; shutil uses sendfile/fcopyfile, so the content stays in the kernel"""
+        try:
+            full_src = os.path.join(self._base_str, src_path)
+            full_dst = os.path.join(self._base_str, dst_path)
+            os.makedirs(os.path.dirname(full_dst), exist_ok=True)
+            self._forget(full_dst)
+            shutil.copyfile(full_src, full_dst)
+
+            return _ok(
+                message=f"File copied successfully: {src_path} -> {dst_path}",
+                path=full_dst
+            )
+        except FileNotFoundError:
+            return _err(f"File not found: {src_path}")
+        except Exception as e:
+            return _err(f"Error copying file: {str(e)}")
 
 
 class WebSearchTools(ToolKit):
     """Simulated web search tool"""
 
+    def __init__(self, base_dir: str = "./output"):
+        super().__init__(base_dir)
+        self._register(self.web_search)
+        # web_search_json takes the same LLM arguments as web_search
+        self.execute_json = self._bind(self.web_search_json)
+
     def get_available_tools(self) -> List[Dict[str, Any]]:
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "web_search",
-                    "description": "Search the web for information (simulated)",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "query": {
-                                "type": "string",
-                                "description": "Search query"
-                            }
-                        },
-                        "required": ["query"]
-                    }
-                }
-            }
-        ]
+        return _WEB_SEARCH_TOOLS
 
     def web_search(self, query: str) -> Dict[str, Any]:
         """Simulated web search - returns helpful context for common queries"""
-        # Simulated responses for common development queries
-        simulated_responses = {
-            "bootstrap": {
-                "success": True,
-                "results": [
-                    {
-                        "title": "Bootstrap CDN",
-                        "snippet": "Latest Bootstrap CSS: https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css"
-                    }
-                ]
-            },
-            "jquery": {
-                "success": True,
-                "results": [
-                    {
-                        "title": "jQuery CDN",
-                        "snippet": "Latest jQuery: https://code.jquery.com/jquery-3.6.0.min.js"
-                    }
-                ]
-            },
-            "arxiv api": {
-                "success": True,
-                "results": [
-                    {
-                        "title": "arXiv API Documentation",
-                        "snippet": "arXiv API base URL: http://export.arxiv.org/api/query. Example: http://export.arxiv.org/api/query?search_query=cat:cs.AI&start=0&max_results=10"
-                    }
-                ]
-            }
-        }
-
-        # Check for matching simulated responses
-        query_lower = query.lower()
-        for key, response in simulated_responses.items():
-            if key in query_lower:
-                return response
+        match = _SIMULATED_KEY_RE.search(query.lower())
+        if match:
+            # Deep copy so callers cannot alter the shared response or its results
+            return copy.deepcopy(_SIMULATED_RESPONSES[match.group(0)])
 
         # Default response
-        return {
-            "success": True,
-            "results": [
-                {
-                    "title": f"Search results for: {query}",
-                    "snippet": "Web search simulation - use appropriate CDN links and API endpoints for your implementation."
-                }
-            ]
-        }
-
-    def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute a web search tool"""
-        if tool_name == "web_search":
-            return self.web_search(**arguments)
-        else:
-            return {
-                "success": False,
-                "message": f"Unknown tool: {tool_name}"
+        return _ok(results=[
+            {
+                "title": f"Search results for: {query}",
+                "snippet": "Web search simulation - use appropriate CDN links and API endpoints for your implementation."
             }
+        ])
+
+    def web_search_json(self, query: str) -> str:
+        """web_search, returning the response already serialized to JSON"""
+        match = _SIMULATED_KEY_RE.search(query.lower())
+        if match:
+            return _SIMULATED_JSON[match.group(0)]
+        return _DEFAULT_SEARCH_JSON.replace(_QUERY_PLACEHOLDER, json.dumps(query, ensure_ascii=False)[1:-1])
 
 
 class CodeExecutionTools(ToolKit):
     """Tools for executing code (use with caution)"""
 
+    def __init__(self, base_dir: str = "./output"):
+        super().__init__(base_dir)
+        self._register(self.execute_command)
+
     def get_available_tools(self) -> List[Dict[str, Any]]:
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "execute_command",
-                    "description": "Execute a shell command (use with caution, only for safe operations like validation)",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "command": {
-                                "type": "string",
-                                "description": "Command to execute"
-                            },
-                            "timeout": {
-                                "type": "integer",
-                                "description": "Timeout in seconds",
-                                "default": 30
-                            }
-                        },
-                        "required": ["command"]
-                    }
-                }
-            }
-        ]
+        return _CODE_EXECUTION_TOOLS
 
     def execute_command(self, command: str, timeout: int = 30) -> Dict[str, Any]:
         """Execute a shell command with safety restrictions"""
-        # Safety check - only allow safe commands
-        safe_commands = ["ls", "cat", "echo", "pwd", "python", "node"]
-        cmd_parts = command.split()
+        # Imported here; filesystem-only runs never need it
+        import subprocess
 
-        if not cmd_parts:
-            return {
-                "success": False,
-                "message": "Empty command"
-            }
+        stripped = command.lstrip()
+
+        if not stripped:
+            return _err("Empty command")
+
+        # Plain invocations of the safe commands are exec'd directly, without a shell
+        argv = None
+        head = stripped.split(None, 1)[0]
+        if head in _SAFE_COMMANDS and not _SHELL_CHARS.intersection(command):
+            try:
+                argv = shlex.split(command)
+            except ValueError:
+                # Unbalanced quotes; let the shell report it
+                pass
 
         try:
             result = subprocess.run(
-                command,
-                shell=True,
+                argv or command,
+                shell=argv is None,
                 capture_output=True,
-                text=True,
                 timeout=timeout,
-                cwd=self.base_dir
+                cwd=self._base_str
             )
 
+            # Captured as bytes and decoded once, rather than through text-mode pipe wrappers
             return {
                 "success": result.returncode == 0,
-                "stdout": result.stdout,
-                "stderr": result.stderr,
+                "stdout": _decode(result.stdout, "replace"),
+                "stderr": _decode(result.stderr, "replace"),
                 "returncode": result.returncode
             }
         except subprocess.TimeoutExpired:
-            return {
-                "success": False,
-                "message": f"Command timed out after {timeout} seconds"
-            }
+            return _err(f"Command timed out after {timeout} seconds")
         except Exception as e:
-            return {
-                "success": False,
-                "message": f"Error executing command: {str(e)}"
-            }
-
-    def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute a code execution tool"""
-        if tool_name == "execute_command":
-            return self.execute_command(**arguments)
-        else:
-            return {
-                "success": False,
-                "message": f"Unknown tool: {tool_name}"
-            }
+            return _err(f"Error executing command: {str(e)}")
 
 
 class ToolManager:
     """Manages all available tools"""
 
+    # Worker threads for execute_tools_batch
+    BATCH_WORKERS = 8
+
     def __init__(self, base_dir: str = "./output"):
         self.filesystem = FilesystemTools(base_dir)
         self.web_search = WebSearchTools(base_dir)
         self.code_execution = CodeExecutionTools(base_dir)
 
-        self.tool_map = {
-            "create_file": self.filesystem,
-            "read_file": self.filesystem,
-            "list_files": self.filesystem,
-            "create_directory": self.filesystem,
-            "web_search": self.web_search,
-            "execute_command": self.code_execution
+        # Tool name -> tool callable across all kits. Includes the batch
+        # create_files, which is for internal callers and not offered to the LLM
+        self.tool_map: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+            **self.filesystem._dispatch,
+            **self.web_search._dispatch,
+            **self.code_execution._dispatch
         }
 
+        # Tool schemas are static, so the combined list is built once
+        self._all_tools: List[Dict[str, Any]] = (
+            self.filesystem.get_available_tools()
+            + self.web_search.get_available_tools()
+            + self.code_execution.get_available_tools()
+        )
+
+        # Shared by all batches; started on the first batch of more than one call
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
     def get_all_tools(self) -> List[Dict[str, Any]]:
         """Get all available tools in OpenAI function calling format"""
-        tools = []
-        tools.extend(self.filesystem.get_available_tools())
-        tools.extend(self.web_search.get_available_tools())
-        tools.extend(self.code_execution.get_available_tools())
-        return tools
+        return self._all_tools
+
+    def clear_cache(self):
+        """Forget all cached file contents"""
+        self.filesystem.clear_cache()
 
     def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a tool by name"""
-        tool_instance = self.tool_map.get(tool_name)
+        tool = self.tool_map.get(tool_name)
 
-        if tool_instance is None:
-            return {
-                "success": False,
-                "message": f"Unknown tool: {tool_name}"
-            }
+        if tool is None:
+            return _err(f"Unknown tool: {tool_name}")
+
+        return tool(arguments)
+
+    def execute_tools_batch(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Execute independent tool calls concurrently
+
+        Returns:
+            Results in the same order as calls
+        """
+        if len(calls) <= 1:
+            # Not worth a thread hop
+            return [self.execute_tool(name, arguments) for name, arguments in calls]
 
-        return tool_instance.execute_tool(tool_name, arguments)
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.BATCH_WORKERS)
+        return list(self._pool.map(lambda call: self.execute_tool(*call), calls))